@@ -126,7 +126,9 @@ class Window(Frame):
                                                  self.verbose,
                                                  username,
                                                  self.scrape_cb,
-                                                 self.progress_text)
+                                                 self.progress_text,
+                                                 resume=self.resume.get(),
+                                                 profile=self.profile.get())
             if not self.active_thread.verify():
                 tkMessageBox.showerror("Error", "Username not found")
                 self.start_button.config(state=tk.NORMAL)
@@ -146,7 +148,9 @@ class Window(Frame):
                                                self.verbose,
                                                username,
                                                self.scrape_cb,
-                                               self.progress_text)
+                                               self.progress_text,
+                                               resume=self.resume.get(),
+                                               profile=self.profile.get())
             if not self.active_thread.verify():
                 tkMessageBox.showerror("Error", "Username not found")
                 self.start_button.config(state=tk.NORMAL)
@@ -172,7 +176,9 @@ class Window(Frame):
                                                self.verbose,
                                                self.forum_url,
                                                self.scrape_cb,
-                                               self.progress_text)
+                                               self.progress_text,
+                                               resume=self.resume.get(),
+                                               profile=self.profile.get())
             if not self.active_thread.verify():
                 tkMessageBox.showerror("Error", "Forum URL not found")
                 self.start_button.config(state=tk.NORMAL)
@@ -192,7 +198,9 @@ class Window(Frame):
                                                  self.verbose,
                                                  username,
                                                  self.scrape_cb,
-                                                 self.progress_text)
+                                                 self.progress_text,
+                                                 resume=self.resume.get(),
+                                                 profile=self.profile.get())
             if not self.active_thread.verify():
                 tkMessageBox.showerror("Error", "Username not found")
                 self.start_button.config(state=tk.NORMAL)
@@ -219,7 +227,9 @@ class Window(Frame):
                                                  self.verbose,
                                                  group_name,
                                                  self.scrape_cb,
-                                                 self.progress_text)
+                                                 self.progress_text,
+                                                 resume=self.resume.get(),
+                                                 profile=self.profile.get())
             if not self.active_thread.verify():
                 tkMessageBox.showerror("Error", "Group name not found")
                 self.start_button.config(state=tk.NORMAL)
@@ -268,6 +278,18 @@ class Window(Frame):
         self.path_button = Button(self, text="Directory", command=self.get_dir)
         self.path_button.grid(row=start_row+1, column=0, sticky=tk.W, pady=10)
 
+        self.resume = IntVar()
+        self.resume_button = tk.Checkbutton(self, text="Resume previous run",
+                                            variable=self.resume)
+        self.resume_button.grid(row=start_row+1, column=1, sticky=tk.W,
+                                pady=10)
+
+        self.profile = IntVar()
+        self.profile_button = tk.Checkbutton(self, text="Profile run",
+                                             variable=self.profile)
+        self.profile_button.grid(row=start_row+1, column=1, sticky=tk.E,
+                                 pady=10)
+
     def init_archive_types(self):
         """
             Initializes the archive type entry portion of the GUI
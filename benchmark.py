@@ -0,0 +1,482 @@
+#! /usr/bin/python
+
+import sys
+import os
+import time
+import json
+import shutil
+import argparse
+import tempfile
+import threading
+import multiprocessing
+import BaseHTTPServer
+import SocketServer
+import urlparse
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from rtarchive import ForumArchiver, JournalArchiver, ImageArchiver, \
+    FriendsArchiver, GroupArchiver, VERSION, DEFAULT_WORKERS, \
+    DEFAULT_PREFETCH
+
+# Archivers that can be benchmarked, in the order they are run
+ARCHIVERS = [
+    ("forum", ForumArchiver),
+    ("journals", JournalArchiver),
+    ("images", ImageArchiver),
+    ("friends", FriendsArchiver),
+    ("groups", GroupArchiver)
+]
+# Username and group name served by the fixture
+FIXTURE_USER = "benchmark"
+# Path of the forum thread served by the fixture
+FIXTURE_THREAD = "/forum/benchmark-thread"
+# Number of albums in the fixture gallery
+FIXTURE_ALBUMS = 2
+# Stands in for "album" in the image names of album pages, which the
+# archivers would otherwise take for album links
+FIXTURE_ALBUM_NAME = "set"
+# Throughput measurements compared against a baseline
+RATES = ["pages_per_sec", "posts_per_sec", "bytes_per_sec"]
+
+parser = argparse.ArgumentParser(
+    description='Benchmark the archivers against a local fixture server')
+
+parser.add_argument("-a", "--archivers", type=str,
+                    default=",".join(name for name, _ in ARCHIVERS),
+                    help="Comma separated archivers to run")
+parser.add_argument("--pages", type=int, default=40,
+                    help="Number of forum and journal pages")
+parser.add_argument("--posts", type=int, default=20,
+                    help="Number of posts per page")
+parser.add_argument("--image-pages", type=int, default=3,
+                    help="Number of pages in the gallery and each album")
+parser.add_argument("--images", type=int, default=12,
+                    help="Number of images per gallery page")
+parser.add_argument("--image-size", type=int, default=64,
+                    help="Size of each image in KB")
+parser.add_argument("-l", "--latency", type=float, default=20,
+                    help="Milliseconds the server waits before each response")
+parser.add_argument("-n", "--repeat", type=int, default=1,
+                    help="Number of runs of each archiver; the best is kept")
+parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS,
+                    help="Number of parallel requests")
+parser.add_argument("-f", "--prefetch", type=int, default=DEFAULT_PREFETCH,
+                    help="Number of pages to download ahead of parsing")
+parser.add_argument("-P", "--processes", type=int, default=0,
+                    help="Number of processes to parse forum pages in")
+parser.add_argument("--max-rate", type=float, default=10000.0,
+                    help="Highest number of requests per second")
+parser.add_argument("--parser", type=str, default=None,
+                    help="HTML parser to use; lxml or html.parser")
+parser.add_argument("-o", "--output", type=str, default=None,
+                    help="File to save the results to as JSON")
+parser.add_argument("-b", "--baseline", type=str, default=None,
+                    help="Results file to compare against")
+parser.add_argument("-t", "--tolerance", type=float, default=0.1,
+                    help="Fraction a rate may fall below the baseline "
+                    "before it is reported as a regression")
+
+
+class FixtureSite(object):
+    """
+        Generates RT style pages and counts what has been served
+
+        Args:
+            pages(:class:`int`): Number of forum and journal pages
+            posts(:class:`int`): Number of posts per page
+            image_pages(:class:`int`): Number of pages per gallery
+            images(:class:`int`): Number of images per gallery page
+            image_size(:class:`int`): Size of each image in bytes
+            latency(:class:`float`): Seconds to wait before each response
+    """
+
+    def __init__(self, pages, posts, image_pages, images, image_size,
+                 latency):
+        self.pages = pages
+        self.posts = posts
+        self.image_pages = image_pages
+        self.images = images
+        self.image_size = image_size
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+            Clears the counts of served pages, posts and images
+        """
+        with self.lock:
+            self.pages_served = 0
+            self.posts_served = 0
+            self.images_served = 0
+            self.album_images_served = 0
+
+    def count(self, posts):
+        """
+            Records that an html page was served
+
+            Args:
+                posts(:class:`int`): Number of posts on the page
+        """
+        with self.lock:
+            self.pages_served += 1
+            self.posts_served += posts
+
+    def count_image(self, name):
+        """
+            Records that an image was served
+
+            Args:
+                name(:class:`str`): Name of the image
+        """
+        with self.lock:
+            self.images_served += 1
+            if "_%s" % FIXTURE_ALBUM_NAME in name:
+                self.album_images_served += 1
+
+    def forum(self, page):
+        """
+            Generates a page of the forum thread
+
+            Args:
+                page(:class:`int`): Page number
+
+            Returns:
+                :class:`tuple` Html of the page and number of posts on it
+        """
+        first = (page - 1) * self.posts + 1
+        posts = "".join(
+            '<div class="media-content"><a href="/user/user%d">user%d</a> '
+            '<a href="#%d">#%d</a>'
+            '<p class="post-stamp" title="2015-01-01 12:00">x</p>'
+            '<div class="post-body"><p>Post %d of the thread with a '
+            '<b>little</b> markup &amp; text.</p>'
+            '<a href="%s/%d">In reply to</a></div>'
+            '<p class="overall-mod" data-value="%d"></p></div>' %
+            (num % 50, num % 50, num, num, num, FIXTURE_THREAD,
+             max(1, num - 1), num % 5)
+            for num in xrange(first, first + self.posts))
+        html = ('<html><body><h1 class="content-title">Benchmark Thread</h1>'
+                '<section class="pagination"><ul>'
+                '<li class=""><a href="?page=1">1</a></li>'
+                '<li class=""><a href="?page=%d">%d</a></li></ul></section>'
+                '%s</body></html>' % (self.pages, self.pages, posts))
+        return html, self.posts
+
+    def activity(self, page):
+        """
+            Generates a page of a user or group activity feed; pages after
+            the last are empty
+
+            Args:
+                page(:class:`int`): Page number
+
+            Returns:
+                :class:`tuple` Html of the page and number of posts on it
+        """
+        if page > self.pages:
+            return "<html><body></body></html>", 0
+        first = (self.pages - page + 1) * self.posts
+        posts = "".join(
+            '<div class="media-content">'
+            '<p class="post-tag-label">News</p>'
+            '<h3 class="feed-item-title"><a href="/j/%d">Journal %d</a></h3>'
+            '<div class="post-content"><p>Journal %d with a <i>little</i> '
+            'markup.</p></div><p class="overall-mod" data-value="3"></p>'
+            '</div>' % (num, num, num)
+            for num in xrange(first, first - self.posts, -1))
+        return "<html><body>%s</body></html>" % posts, self.posts
+
+    def friends(self, page):
+        """
+            Generates a page of a friends list; pages after the last are
+            empty
+
+            Args:
+                page(:class:`int`): Page number
+
+            Returns:
+                :class:`tuple` Html of the page and number of names on it
+        """
+        if page > self.pages:
+            return "<html><body></body></html>", 0
+        names = "".join('<p class="name">friend%d_%d</p>' % (page, num)
+                        for num in xrange(self.posts))
+        return "<html><body>%s</body></html>" % names, self.posts
+
+    def gallery(self, host, path, page):
+        """
+            Generates a page of the gallery or of an album. The first
+            gallery page also links to the albums
+
+            Args:
+                host(:class:`str`): Host the server is reached at
+                path(:class:`str`): Path of the gallery or album
+                page(:class:`int`): Page number
+
+            Returns:
+                :class:`tuple` Html of the page and number of images on it
+        """
+        if page > self.image_pages:
+            return "<html><body></body></html>", 0
+        prefix = path.strip("/").replace("/album/", "/" + FIXTURE_ALBUM_NAME)
+        prefix = prefix.replace("/", "_")
+        items = "".join('<li><a href="http://%s/imgpage/%s_%d_%d">i</a></li>' %
+                        (host, prefix, page, num)
+                        for num in xrange(self.images))
+        albums = ""
+        if path.endswith("/images"):
+            albums = '<ul class="large-image-blocks">%s</ul>' % "".join(
+                '<li><a href="http://%s%s/album/%d">'
+                '<p class="name">Album %d</p></a></li>' %
+                (host, path, num, num) for num in xrange(FIXTURE_ALBUMS))
+        html = ('<html><body>%s<ul class="large-image-blocks">%s</ul>'
+                '</body></html>' % (albums, items))
+        return html, self.images
+
+
+class FixtureHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+        Serves the pages of the :class:`FixtureSite` of its server
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        site = self.server.site
+        time.sleep(site.latency)
+        url = urlparse.urlparse(self.path)
+        query = urlparse.parse_qs(url.query)
+        page = int(query.get("page", ["1"])[0])
+        host = self.headers.get("Host")
+        content_type = "text/html"
+        if url.path == FIXTURE_THREAD:
+            body, posts = site.forum(page)
+        elif url.path.startswith("/imgpage/"):
+            body = ('<html><body><img class="full-image" '
+                    'src="//%s/img/%s.jpg"></body></html>' %
+                    (host, url.path.split("/")[-1]))
+            posts = 0
+        elif url.path.startswith("/img/"):
+            body = "\xff" * site.image_size
+            site.count_image(url.path.split("/")[-1])
+            content_type = "image/jpeg"
+        elif url.path.endswith("/friends"):
+            body, posts = site.friends(page)
+        elif "/images" in url.path:
+            body, posts = site.gallery(host, url.path, page)
+        elif url.path in ("/user/" + FIXTURE_USER, "/group/" + FIXTURE_USER):
+            body, posts = site.activity(page)
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if content_type == "text/html":
+            site.count(posts)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FixtureServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+        Local HTTP server for a :class:`FixtureSite`, listening on a free
+        port
+
+        Args:
+            site(:class:`FixtureSite`): Site to serve
+    """
+
+    daemon_threads = True
+
+    def __init__(self, site):
+        BaseHTTPServer.HTTPServer.__init__(self, ("127.0.0.1", 0),
+                                           FixtureHandler)
+        self.site = site
+        self.url = "http://127.0.0.1:%d" % self.server_address[1]
+
+    def start(self):
+        """
+            Serves requests on a background thread
+        """
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+
+def peak_rss():
+    """
+        Gets the peak resident memory of the current process
+
+        Returns:
+            :class:`int` Peak resident memory in bytes; 0 if unknown
+    """
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on OSX and kilobytes elsewhere
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def run_archiver(name, url, path, options, results):
+    """
+        Runs an archiver to completion against the fixture. Called in a
+        child process so the peak memory measured is its own
+
+        Args:
+            name(:class:`str`): Name of the archiver in :data:`ARCHIVERS`
+            url(:class:`str`): Base URL of the fixture server
+            path(:class:`str`): Directory to write the archive and log to
+            options(:class:`dict`): Keyword arguments for the archiver
+            results(:class:`multiprocessing.Queue`): Queue to put the
+                measurements on
+    """
+    os.chdir(path)
+    archiver_class = dict(ARCHIVERS)[name]
+    if archiver_class is ForumArchiver:
+        archiver = archiver_class(0, 25, path, False, url + FIXTURE_THREAD,
+                                  None, None, **options)
+    else:
+        archiver = archiver_class(0, 25, path, False, FIXTURE_USER, None,
+                                  None, site_url=url, **options)
+    start = time.time()
+    archiver.run()
+    elapsed = time.time() - start
+    metrics = archiver.metrics.to_dict()
+    results.put({"elapsed": elapsed,
+                 "requests": metrics["counters"]["requests"],
+                 "bytes": metrics["counters"]["bytes"],
+                 "stages": dict((stage, timing["total"]) for stage, timing
+                                in metrics["stages"].items()),
+                 "peak_rss": peak_rss()})
+
+
+def benchmark(name, server, options):
+    """
+        Measures one run of an archiver
+
+        Args:
+            name(:class:`str`): Name of the archiver in :data:`ARCHIVERS`
+            server(:class:`FixtureServer`): Server of the fixture
+            options(:class:`dict`): Keyword arguments for the archiver
+
+        Returns:
+            :class:`dict` Measurements of the run
+
+        Raises:
+            :class:`RuntimeError`: The archiver failed
+    """
+    path = tempfile.mkdtemp(prefix="rtbench-")
+    results = multiprocessing.Queue()
+    server.site.reset()
+    try:
+        process = multiprocessing.Process(
+            target=run_archiver,
+            args=(name, server.url, path, options, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            raise RuntimeError("%s archiver exited with %d" %
+                               (name, process.exitcode))
+        result = results.get()
+    finally:
+        shutil.rmtree(path, True)
+    elapsed = result["elapsed"]
+    result.update(pages=server.site.pages_served,
+                  posts=server.site.posts_served,
+                  images=server.site.images_served,
+                  album_images=server.site.album_images_served,
+                  pages_per_sec=server.site.pages_served / elapsed,
+                  posts_per_sec=server.site.posts_served / elapsed,
+                  bytes_per_sec=result["bytes"] / elapsed)
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """
+        Prints the change of each rate from a baseline
+
+        Args:
+            results(:class:`dict`): Measurements of each archiver
+            baseline(:class:`dict`): Earlier measurements of each archiver
+            tolerance(:class:`float`): Fraction a rate may fall before it
+                counts as a regression
+
+        Returns:
+            :class:`list` Names of the regressed measurements
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        for rate in RATES:
+            before = baseline.get(name, {}).get(rate)
+            if not before:
+                continue
+            change = result[rate] / before - 1
+            flag = ""
+            if change < -tolerance:
+                flag = " REGRESSION"
+                regressions.append("%s %s" % (name, rate))
+            print("%-9s %-14s %+7.1f%%%s" % (name, rate, change * 100, flag))
+    return regressions
+
+
+def main():
+    args = parser.parse_args()
+    names = [name.strip() for name in args.archivers.split(",")]
+    unknown = set(names) - set(dict(ARCHIVERS))
+    if unknown:
+        print("Unknown archivers: %s" % ", ".join(sorted(unknown)))
+        return -1
+
+    site = FixtureSite(args.pages, args.posts, args.image_pages, args.images,
+                       args.image_size * 1024, args.latency / 1000.0)
+    server = FixtureServer(site)
+    server.start()
+    options = {"workers": args.workers, "prefetch": args.prefetch,
+               "processes": args.processes, "max_rate": args.max_rate,
+               "parser": args.parser}
+
+    results = {}
+    print("%-9s %7s %7s %8s %9s %10s %10s %7s %7s %8s" %
+          ("archiver", "secs", "pages", "pages/s", "posts/s", "KB/s",
+           "requests", "images", "albums", "RSS MB"))
+    try:
+        for name in names:
+            runs = [benchmark(name, server, options)
+                    for _ in xrange(max(1, args.repeat))]
+            result = min(runs, key=lambda run: run["elapsed"])
+            results[name] = result
+            print("%-9s %7.2f %7d %8.1f %9.1f %10.1f %10d %7d %7d %8.1f" %
+                  (name, result["elapsed"], result["pages"],
+                   result["pages_per_sec"], result["posts_per_sec"],
+                   result["bytes_per_sec"] / 1024, result["requests"],
+                   result["images"], result["album_images"],
+                   result["peak_rss"] / (1024.0 * 1024)))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    if args.output:
+        with open(args.output, "wb") as f:
+            json.dump({"version": VERSION, "options": vars(args),
+                       "results": results}, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline, "rb") as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
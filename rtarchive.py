@@ -1,19 +1,43 @@
 #! /usr/bin/python
 
-from bs4 import BeautifulSoup, Tag
+from bs4 import BeautifulSoup, FeatureNotFound
 import requests
 import os
+import sys
 import urlparse
 import string
 import logging
 import re
 import threading
 import Queue
-
+import multiprocessing
+import json
+import hashlib
+import collections
+import itertools
+import shutil
+import time
+import random
+import bisect
+import functools
+import cProfile
+from email.utils import parsedate_tz, mktime_tz
+from contextlib import closing, contextmanager
+from xml.sax.saxutils import escape, quoteattr
+
+from requests.adapters import HTTPAdapter
 from requests.sessions import InvalidSchema
 from requests.models import MissingSchema
 
-VERSION = "1.0.1"
+try:
+    import lxml
+    DEFAULT_PARSER = "lxml"
+except ImportError:
+    DEFAULT_PARSER = "html.parser"
+# Parser bundled with Python, used if the requested one is unavailable
+FALLBACK_PARSER = "html.parser"
+
+VERSION = "1.1"
 """
     CHANGELOG
     0.1 - Initial working code and documentation
@@ -25,6 +49,8 @@ VERSION = "1.0.1"
     0.4 - Adds feature to scrape friends list
     1.0 - Adds feature to scrape group news posts
     1.0.1 - Fixes bug with parsing album names
+    1.1 - Reuses pooled keep-alive connections for all requests
+          Adds resuming interrupted journal and forum scrapes
 """
 
 
@@ -32,7 +58,103 @@ HEADERS = {
     'User-Agent': 'RT Site Scraper'
 }
 
+# Base URL of the site users and groups are scraped from
+SITE_URL = "https://roosterteeth.com"
+
+# Number of distinct hosts to keep connection pools for
+DEFAULT_POOL_SIZE = 10
+# Maximum number of open connections to a single host
+DEFAULT_HOST_CONNECTIONS = 10
+# Number of worker threads used for parallel requests
+DEFAULT_WORKERS = 8
+# Number of tasks that may wait in the work queue per worker
+QUEUE_DEPTH = 2
+# Number of pages to request ahead of the page being parsed
+DEFAULT_PREFETCH = 4
+# Size in bytes of the buffer used when writing output files
+WRITE_BUFFER_SIZE = 256 * 1024
+# Name of the file recording crawl progress in an output directory
+CHECKPOINT_FILE = ".checkpoint"
+# Name of the file listing the digests of archived journals, newest first
+INDEX_FILE = ".index"
+# Name of the file recording the downloaded images of a gallery
+MANIFEST_FILE = ".manifest"
+# Name of the file mapping image URLs to digests in an image store
+STORE_INDEX_FILE = ".urls"
+# Suffix of images that are still being downloaded
+PART_SUFFIX = ".part"
+# Size in bytes of the reads from the network when downloading images
+DEFAULT_CHUNK_SIZE = 256 * 1024
+# Maximum bytes of page bodies kept in the response cache
+DEFAULT_CACHE_SIZE = 512 * 1024 * 1024
+# Number of batch jobs run at the same time
+DEFAULT_JOBS = 4
+# Number of image albums crawled at the same time
+DEFAULT_ALBUM_JOBS = 4
+# Number of pages fetched and parsed by a worker process per task
+SHARD_SIZE = 4
+# Requests per second allowed before the server has been heard from
+DEFAULT_RATE = 10.0
+# Highest requests per second the rate limiter will reach
+DEFAULT_MAX_RATE = 50.0
+# Lowest requests per second the rate limiter will fall to
+MIN_RATE = 0.5
+# Factor the rate is multiplied by after each successful request until
+# the server first asks to slow down
+SLOW_START_FACTOR = 1.1
+# Requests per second added to the rate after each successful request
+# once the server has asked to slow down
+RATE_INCREASE = 0.5
+# Factor the rate is multiplied by when the server asks to slow down
+RATE_DECREASE = 0.5
+# Number of times a failed request is retried
+DEFAULT_RETRIES = 5
+# Seconds the first retry may wait; doubled for each following retry
+BACKOFF_BASE = 1.0
+# Most seconds to wait between retries when the server gives no delay
+BACKOFF_MAX = 60.0
+# Most seconds to honour from a Retry-After header
+MAX_RETRY_AFTER = 600.0
+# Status codes of responses that are retried and slow the request rate
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Stages of an archive timed by :class:`Metrics`
+METRIC_STAGES = ("fetch", "parse", "format", "write")
+# Events counted by :class:`Metrics`
+METRIC_COUNTERS = ("requests", "bytes", "retries", "cache_hits")
+# Upper bounds in seconds of the buckets of the stage timing histograms
+METRIC_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+# File the deterministic profile of a run is written to, in pstats format
+PROFILE_STATS_FILE = "archive.pstats"
+# File the sampled stacks of a run are written to, in the collapsed format
+# read by flamegraph tools
+PROFILE_STACKS_FILE = "archive.folded"
+# Seconds between samples of the thread stacks while profiling
+SAMPLE_INTERVAL = 0.005
+
 valid_chars = "-_.%s%s" % (string.ascii_letters, string.digits)
+# Guards adding the log handlers, which archivers share
+logger_lock = threading.Lock()
+
+# Layout of a forum post in the archive files
+POST_TEMPLATE = (u'<h3><a name={anchor}>{poster}</a></h3>\n'
+                 u'<p><a href={link}>{post_num}</a> - {timestamp}</p>\n'
+                 u'{body}\n'
+                 u'<p><em>Mods: {mods:d}</em></p>\n'
+                 u'<hr/>\n')
+# Layout of a journal in the archive files
+JOURNAL_TEMPLATE = (u'<h3>{title}</h3>\n'
+                    u'{body}\n'
+                    u'<p><em>Mods: {mods:d}</em></p>\n'
+                    u'<hr/>\n')
+# Comment placed before each journal so an archive can be split into posts
+JOURNAL_MARKER = u'<!-- post:{digest} -->\n'
+JOURNAL_MARKER_RE = re.compile(u'<!-- post:([0-9a-f]+) -->')
+# Comment placed before the posts of each forum page so an archive can be
+# cut at a page boundary
+PAGE_MARKER = u'<!-- page:{page:d} -->\n'
+PAGE_MARKER_RE = re.compile(r'<!-- page:(\d+) -->')
+# Content-Range header of a partial response: first byte and total size
+CONTENT_RANGE_RE = re.compile(r'bytes (\d+)-\d+/(\d+|\*)')
 
 
 """
@@ -43,6 +165,82 @@ valid_chars = "-_.%s%s" % (string.ascii_letters, string.digits)
 """
 
 
+def make_session(pool_size, host_connections):
+    """
+        Creates an HTTP session whose connections are kept alive and
+        reused between requests
+
+        Args:
+            pool_size(:class:`int`): Number of hosts to keep pooled
+                connections for
+            host_connections(:class:`int`): Maximum number of simultaneous
+                connections to a single host
+
+        Returns:
+            :class:`requests.Session` Session to make requests with
+    """
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size,
+                          pool_maxsize=host_connections,
+                          pool_block=True)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def retry_after(response):
+    """
+        Gets the delay requested by the Retry-After header of a response
+
+        Args:
+            response(:class:`requests.Response`): Response to check
+
+        Returns:
+            :class:`float` Seconds to wait, at most `MAX_RETRY_AFTER`;
+                None if the response gives no valid delay
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        date = parsedate_tz(value)
+        if date is None:
+            return None
+        delay = mktime_tz(date) - time.time()
+    return min(max(0.0, delay), MAX_RETRY_AFTER)
+
+
+def backoff_delay(attempt):
+    """
+        Picks a random delay before retrying a request. The longest
+        possible delay doubles with each attempt
+
+        Args:
+            attempt(:class:`int`): Number of attempts already retried
+
+        Returns:
+            :class:`float` Seconds to wait
+    """
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def replace_file(source, destination):
+    """
+        Moves a finished file over the file it replaces
+
+        Args:
+            source(:class:`str`): File to move
+            destination(:class:`str`): File to replace
+    """
+    # Windows will not rename over an existing file
+    if os.name == "nt" and os.path.exists(destination):
+        os.remove(destination)
+    os.rename(source, destination)
+
+
 class LimitReached(Exception):
     """
         Exception raised when a function reaches the max number of
@@ -51,36 +249,1019 @@ class LimitReached(Exception):
     pass
 
 
-class LinkDownloadThread(threading.Thread):
+class Task(object):
+    """
+        A unit of work to be run by a :class:`WorkerPool`
+
+        Args:
+            func(:class:`function`): Function to call
+            args(:class:`tuple`): Arguments to call the function with
+    """
+
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+        self.value = None
+        self.error = None
+        self.done = threading.Event()
+
+    @classmethod
+    def completed(cls, value):
+        """
+            Creates a task that has already run
+
+            Args:
+                value: Result of the task
+
+            Returns:
+                :class:`Task` Task returning the value
+        """
+        task = cls(None, ())
+        task.value = value
+        task.done.set()
+        return task
+
+    def run(self):
+        """
+            Calls the function, storing its return value or exception
+        """
+        try:
+            self.value = self.func(*self.args)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+    def result(self):
+        """
+            Blocks until the task has been run
+
+            Returns:
+                Value returned by the function
+
+            Raises:
+                Any exception raised by the function
+        """
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class WorkerThread(threading.Thread):
+    """
+        Runs tasks from a queue until it receives None
+
+        Args:
+            tasks(:class:`Queue.Queue`): Queue to take tasks from
+    """
+
+    def __init__(self, tasks):
+        self.tasks = tasks
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+    def run(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                break
+            task.run()
+
+
+class WorkerPool(object):
+    """
+        Fixed size pool of worker threads fed by a bounded work queue.
+        Threads are started on the first submitted task
+
+        Args:
+            workers(:class:`int`): Number of worker threads
+    """
+
+    def __init__(self, workers):
+        self.workers = max(1, workers)
+        self.tasks = Queue.Queue(maxsize=self.workers * QUEUE_DEPTH)
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args):
+        """
+            Queues a function to be called by a worker. Blocks while the
+            work queue is full
+
+            Args:
+                func(:class:`function`): Function to call
+                args: Arguments to call the function with
+
+            Returns:
+                :class:`Task` Task to get the result from
+        """
+        with self.lock:
+            if not self.threads:
+                self.threads = [WorkerThread(self.tasks)
+                                for _ in range(self.workers)]
+                for thread in self.threads:
+                    thread.start()
+        task = Task(func, args)
+        self.tasks.put(task)
+        return task
+
+    def shutdown(self):
+        """
+            Stops all workers once the queued tasks are complete
+        """
+        with self.lock:
+            threads = self.threads
+            self.threads = []
+        for _ in threads:
+            self.tasks.put(None)
+        for thread in threads:
+            thread.join()
+
+
+class RateLimiter(object):
+    """
+        Token bucket pacing requests that adapts to the server. The rate
+        grows by a factor after each successful request until the server
+        first asks to slow down, and by a fixed step after that. It is
+        cut by a factor, at most once a second, when the server asks to
+        slow down. A Retry-After delay pauses all requests sharing the
+        limiter
+
+        Kwargs:
+            rate(:class:`float`): Starting requests per second
+            max_rate(:class:`float`): Highest requests per second
+            min_rate(:class:`float`): Lowest requests per second
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, max_rate=DEFAULT_MAX_RATE,
+                 min_rate=MIN_RATE):
+        self.max_rate = max(min_rate, max_rate)
+        self.min_rate = min_rate
+        self.rate = min(max(min_rate, rate), self.max_rate)
+        self.tokens = 1.0
+        self.updated = time.time()
+        self.decreased = 0.0
+        self.slow_start = True
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+            Blocks until a request may be made
+        """
+        while True:
+            with self.lock:
+                now = time.time()
+                if now >= self.updated:
+                    self.tokens = min(max(1.0, self.rate),
+                                      self.tokens +
+                                      (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    wait = self.updated - now
+            time.sleep(wait)
+
+    def success(self):
+        """
+            Records a successful request, raising the rate
+        """
+        with self.lock:
+            if self.slow_start:
+                rate = self.rate * SLOW_START_FACTOR
+            else:
+                rate = self.rate + RATE_INCREASE
+            self.rate = min(self.max_rate, rate)
+
+    def backoff(self, delay=None):
+        """
+            Records that the server asked to slow down, lowering the rate
+
+            Kwargs:
+                delay(:class:`float`): Seconds to pause all requests for;
+                    None to only lower the rate
+        """
+        with self.lock:
+            now = time.time()
+            self.slow_start = False
+            if now - self.decreased >= 1:
+                self.rate = max(self.min_rate, self.rate * RATE_DECREASE)
+                self.decreased = now
+            if delay:
+                self.tokens = 0.0
+                self.updated = max(self.updated, now + delay)
+
+
+class Metrics(object):
+    """
+        Thread safe counters and per-stage timing histograms describing
+        where an archive spends its time
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.counters = dict.fromkeys(METRIC_COUNTERS, 0)
+        self.stages = {}
+        for stage in METRIC_STAGES:
+            self.stages[stage] = {"count": 0, "total": 0.0, "max": 0.0,
+                                  "buckets": [0] * (len(METRIC_BUCKETS) + 1)}
+        self.lock = threading.Lock()
+
+    def count(self, name, amount=1):
+        """
+            Adds to a counter
+
+            Args:
+                name(:class:`str`): Counter to add to
+
+            Kwargs:
+                amount(:class:`int`): Amount to add
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, stage, seconds):
+        """
+            Records the duration of one run of a stage
+
+            Args:
+                stage(:class:`str`): Stage that ran
+                seconds(:class:`float`): Time the stage took
+        """
+        with self.lock:
+            timing = self.stages[stage]
+            timing["count"] += 1
+            timing["total"] += seconds
+            timing["max"] = max(timing["max"], seconds)
+            timing["buckets"][bisect.bisect_left(METRIC_BUCKETS,
+                                                 seconds)] += 1
+
+    @contextmanager
+    def timer(self, stage):
+        """
+            Times the body of a with statement as a run of a stage
+
+            Args:
+                stage(:class:`str`): Stage being run
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.time() - start)
+
+    def merge(self, other):
+        """
+            Adds the counts and timings of other metrics to these
+
+            Args:
+                other(:class:`Metrics`): Metrics to add, or a dict
+                    returned by :func:`to_dict`
+        """
+        if isinstance(other, Metrics):
+            other = other.to_dict()
+        with self.lock:
+            for name, value in other["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for stage, timing in other["stages"].items():
+                ours = self.stages[stage]
+                ours["count"] += timing["count"]
+                ours["total"] += timing["total"]
+                ours["max"] = max(ours["max"], timing["max"])
+                ours["buckets"] = [ours_count + count for ours_count, count
+                                   in zip(ours["buckets"], timing["buckets"])]
+
+    def to_dict(self):
+        """
+            Copies the metrics
+
+            Returns:
+                :class:`dict` Elapsed seconds, counters and stage timings
+        """
+        with self.lock:
+            stages = dict((stage, dict(timing, buckets=list(timing["buckets"])))
+                          for stage, timing in self.stages.items())
+            return {"elapsed": time.time() - self.started,
+                    "counters": dict(self.counters), "stages": stages}
+
+    def summary(self):
+        """
+            Describes the metrics for the log
+
+            Returns:
+                :class:`str` Counters and the time spent in each stage
+        """
+        metrics = self.to_dict()
+        counters = metrics["counters"]
+        lines = ["Finished in %.2fs: %s" %
+                 (metrics["elapsed"],
+                  ", ".join("%d %s" % (counters[name], name)
+                            for name in sorted(counters)))]
+        for stage in METRIC_STAGES:
+            timing = metrics["stages"][stage]
+            if not timing["count"]:
+                continue
+            lines.append("%-6s %8.3fs over %6d runs, mean %.4fs, max %.4fs" %
+                         (stage, timing["total"], timing["count"],
+                          timing["total"] / timing["count"], timing["max"]))
+        return "\n".join(lines)
+
+    def prometheus(self):
+        """
+            Formats the metrics in the Prometheus text exposition format
+
+            Returns:
+                :class:`str` Metrics as text
+        """
+        metrics = self.to_dict()
+        lines = []
+        for name in sorted(metrics["counters"]):
+            lines.append("# TYPE rtarchive_%s_total counter" % name)
+            lines.append("rtarchive_%s_total %d" %
+                         (name, metrics["counters"][name]))
+        lines.append("# TYPE rtarchive_stage_seconds histogram")
+        bounds = [repr(bound) for bound in METRIC_BUCKETS] + ["+Inf"]
+        for stage in METRIC_STAGES:
+            timing = metrics["stages"][stage]
+            total = 0
+            for bound, count in zip(bounds, timing["buckets"]):
+                total += count
+                lines.append('rtarchive_stage_seconds_bucket{stage="%s",'
+                             'le="%s"} %d' % (stage, bound, total))
+            lines.append('rtarchive_stage_seconds_sum{stage="%s"} %r' %
+                         (stage, timing["total"]))
+            lines.append('rtarchive_stage_seconds_count{stage="%s"} %d' %
+                         (stage, timing["count"]))
+        return "\n".join(lines) + "\n"
+
+    def dump(self, filename):
+        """
+            Writes the metrics to a file, as Prometheus text if its name
+            ends in .prom and as JSON otherwise
+
+            Args:
+                filename(:class:`str`): File to write
+        """
+        with open(filename, "wb") as f:
+            if filename.endswith(".prom"):
+                f.write(self.prometheus())
+            else:
+                json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+
+
+class StackSampler(threading.Thread):
+    """
+        Periodically samples the stacks of every other thread, counting
+        how often each distinct stack is seen. Unlike a deterministic
+        profiler this covers the worker threads as well as the thread
+        being profiled
+
+        Kwargs:
+            interval(:class:`float`): Seconds between samples
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.stoprequest = threading.Event()
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+    def run(self):
+        while not self.stoprequest.isSet():
+            time.sleep(self.interval)
+            self.sample()
+
+    def sample(self):
+        """
+            Records the current stack of every thread but this one. Each
+            stack is rooted at the name of its thread
+        """
+        names = dict((thread.ident, thread.name)
+                     for thread in threading.enumerate())
+        for ident, frame in sys._current_frames().items():
+            if ident == self.ident:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("%s (%s:%d)" %
+                             (code.co_name, os.path.basename(code.co_filename),
+                              code.co_firstlineno))
+                frame = frame.f_back
+            stack.append(names.get(ident, "thread"))
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        """
+            Stops sampling and waits for the sampler to finish
+        """
+        self.stoprequest.set()
+        self.join()
+
+    def write(self, filename):
+        """
+            Writes the sampled stacks in the collapsed format, one stack
+            and its count per line
+
+            Args:
+                filename(:class:`str`): File to write
+        """
+        with open(filename, "wb") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write("%s %d\n" % (stack, count))
+
+
+class PostWriter(object):
+    """
+        Streams formatted posts into a series of numbered html files,
+        closing each file as soon as it holds `size` items
+
+        Args:
+            path(:class:`str`): Directory to write files to
+            size(:class:`int`): Number of items to put in one file; 0 to
+                put all items in one file
+            logger(:class:`logger`): Logging object
+
+        Kwargs:
+            metrics(:class:`Metrics`): Metrics to record write times in
+    """
+
+    def __init__(self, path, size, logger, metrics=None):
+        self.path = path
+        self.size = size
+        self.logger = logger
+        self.metrics = metrics or Metrics()
+        self.file_num = 0
+        self.items = 0
+        self.total = 0
+        self.out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, text):
+        """
+            Writes text to the current file, starting a new file if needed
+
+            Args:
+                text(:class:`unicode`): Text to write
+        """
+        if self.out is None:
+            self.file_num += 1
+            filename = os.path.join(self.path, str(self.file_num) + ".html")
+            self.logger.debug("Writing posts to %s", filename)
+            self.out = open(filename, "wb", WRITE_BUFFER_SIZE)
+            self.out.write("<body>")
+        with self.metrics.timer("write"):
+            self.out.write(text.encode("utf8"))
+
+    def end_item(self):
+        """
+            Marks the end of an item, closing the current file if it is full
+        """
+        self.items += 1
+        self.total += 1
+        if self.size and self.items >= self.size:
+            self.close()
+
+    def state(self):
+        """
+            Flushes the current file and describes the writer position
+
+            Returns:
+                :class:`dict` Keyword arguments for :func:`resume`
+        """
+        offset = None
+        if self.out is not None:
+            self.out.flush()
+            offset = self.out.tell()
+        return {"file_num": self.file_num, "items": self.items,
+                "total": self.total, "offset": offset}
+
+    def resume(self, file_num, items, total, offset):
+        """
+            Continues writing from a position returned by :func:`state`.
+            Anything written to the current file after that position is
+            discarded
+
+            Args:
+                file_num(:class:`int`): Number of the current file
+                items(:class:`int`): Items in the current file
+                total(:class:`int`): Items written to all files
+                offset(:class:`int`): Position in the current file; None
+                    if no file is open
+
+            Raises:
+                :class:`IOError`: The current file could not be opened
+        """
+        self.close()
+        self.file_num = file_num
+        self.total = total
+        if items and offset is not None:
+            filename = os.path.join(self.path, str(file_num) + ".html")
+            self.logger.debug("Resuming %s at %d", filename, offset)
+            self.out = open(filename, "r+b", WRITE_BUFFER_SIZE)
+            self.out.seek(offset)
+            self.out.truncate()
+            self.items = items
+
+    def add(self, text, separator=u"\n"):
+        """
+            Writes a complete item
+
+            Args:
+                text(:class:`unicode`): Item to write
+
+            Kwargs:
+                separator(:class:`unicode`): Written between items in a file
+        """
+        if self.items:
+            self.write(separator)
+        self.write(text)
+        self.end_item()
+
+    def close(self):
+        """
+            Finishes and closes the current file
+        """
+        if self.out is not None:
+            self.out.write("</body>")
+            self.out.close()
+            self.out = None
+        self.items = 0
+
+
+class Checkpoint(object):
+    """
+        Records the progress of a crawl in its output directory so an
+        interrupted crawl can be resumed
+
+        Args:
+            path(:class:`str`): Directory holding the output files
+    """
+
+    def __init__(self, path):
+        self.filename = os.path.join(path, CHECKPOINT_FILE)
+
+    def load(self):
+        """
+            Reads the saved progress
+
+            Returns:
+                :class:`dict` Saved progress; None if there is none
+        """
+        try:
+            with open(self.filename, "rb") as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return None
+
+    def save(self, **state):
+        """
+            Replaces the saved progress
+
+            Kwargs:
+                Values to save
+        """
+        temp = self.filename + ".tmp"
+        with open(temp, "wb") as f:
+            json.dump(state, f)
+        replace_file(temp, self.filename)
+
+    def clear(self):
+        """
+            Removes the saved progress once a crawl completes
+        """
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+
+class ResponseCache(object):
+    """
+        Persistent cache of page bodies keyed by URL. Entries keep the
+        validators sent with them so they can be revalidated with
+        conditional requests. The least recently used entries are removed
+        once the stored bodies exceed the maximum size. One cache should
+        be shared by all archivers using its directory; files are replaced
+        atomically and entries removed by another process are skipped
+
+        Args:
+            path(:class:`str`): Directory to store the cache in
+            max_size(:class:`int`): Maximum bytes of bodies to keep
+            logger(:class:`logger`): Logging object
+    """
+
+    def __init__(self, path, max_size, logger):
+        self.path = path
+        self.max_size = max_size
+        self.logger = logger
+        self.lock = threading.Lock()
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self.size = sum(self.file_size(os.path.join(path, name))
+                        for name in os.listdir(path)
+                        if name.endswith(".body"))
+        if self.size > self.max_size:
+            self.evict()
+
+    def file_size(self, filename):
+        """
+            Gets the size of a cache file
+
+            Args:
+                filename(:class:`str`): File to measure
+
+            Returns:
+                :class:`int` Size in bytes; 0 if the file has been removed
+        """
+        try:
+            return os.path.getsize(filename)
+        except OSError:
+            return 0
+
+    def entry_path(self, url):
+        """
+            Gets the base filename of the entry for a URL
+
+            Args:
+                url(:class:`str`): URL of the entry
+
+            Returns:
+                :class:`str` Path without extension
+        """
+        return os.path.join(self.path,
+                            hashlib.sha1(url.encode("utf8")).hexdigest())
+
+    def get(self, url):
+        """
+            Looks up a cached page, marking it as recently used
+
+            Args:
+                url(:class:`str`): URL of the page
+
+            Returns:
+                :class:`dict` Entry with the body, etag and last_modified
+                    values; None if the URL is not cached
+        """
+        base = self.entry_path(url)
+        with self.lock:
+            try:
+                with open(base + ".json", "rb") as f:
+                    entry = json.load(f)
+                with open(base + ".body", "rb") as f:
+                    entry["body"] = f.read()
+                os.utime(base + ".body", None)
+            except (IOError, OSError, ValueError):
+                return None
+        digest = entry.get("digest")
+        if digest and hashlib.sha1(entry["body"]).hexdigest() != digest:
+            # Body and validators written by different puts
+            return None
+        return entry
+
+    def put(self, url, body, etag, last_modified):
+        """
+            Stores a page, evicting old entries if the cache is full
+
+            Args:
+                url(:class:`str`): URL of the page
+                body(:class:`str`): Content of the page
+                etag(:class:`str`): ETag header of the response
+                last_modified(:class:`str`): Last-Modified header of the
+                    response
+        """
+        base = self.entry_path(url)
+        temp = "%s.%d.%d.tmp" % (base, os.getpid(),
+                                 threading.current_thread().ident)
+        with self.lock:
+            self.size -= self.file_size(base + ".body")
+            with open(temp, "wb") as f:
+                f.write(body)
+            replace_file(temp, base + ".body")
+            with open(temp, "wb") as f:
+                json.dump({"url": url, "etag": etag,
+                           "last_modified": last_modified,
+                           "digest": hashlib.sha1(body).hexdigest()}, f)
+            replace_file(temp, base + ".json")
+            self.size += len(body)
+            if self.size > self.max_size:
+                self.evict()
+
+    def evict(self):
+        """
+            Removes the least recently used entries until the cache fits
+            its maximum size. Must be called with the lock held
+        """
+        bodies = []
+        for name in os.listdir(self.path):
+            if not name.endswith(".body"):
+                continue
+            body = os.path.join(self.path, name)
+            try:
+                bodies.append((os.path.getmtime(body), body))
+            except OSError:
+                continue
+        bodies.sort()
+        for _, body in bodies:
+            if self.size <= self.max_size:
+                break
+            size = self.file_size(body)
+            try:
+                os.remove(body)
+            except OSError:
+                # Already evicted by another process
+                continue
+            self.size -= size
+            try:
+                os.remove(body[:-len(".body")] + ".json")
+            except OSError:
+                pass
+        self.logger.debug("Cache evicted to %d bytes", self.size)
+
+
+class DigestIndex(object):
+    """
+        Persistent record of which archive holds each post, keyed by post
+        digest. Sharing one index between runs and archives lets posts
+        already held by another archive be skipped
+
+        Args:
+            filename(:class:`str`): File to keep the index in
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.owners = {}
+        self.lock = threading.Lock()
+        if os.path.exists(filename):
+            with open(filename, "rb") as f:
+                for line in f:
+                    digest, _, owner = line.rstrip("\n").partition("\t")
+                    self.owners.setdefault(digest, owner)
+
+    def owner(self, digest):
+        """
+            Gets the archive holding a post
+
+            Args:
+                digest(:class:`str`): Digest of the post
+
+            Returns:
+                :class:`str` Archive holding the post; None if unknown
+        """
+        return self.owners.get(digest)
+
+    def add(self, digest, owner):
+        """
+            Records the archive holding a post, unless one already does
+
+            Args:
+                digest(:class:`str`): Digest of the post
+                owner(:class:`str`): Archive holding the post
+        """
+        with self.lock:
+            if digest in self.owners:
+                return
+            self.owners[digest] = owner
+            with open(self.filename, "ab") as f:
+                f.write("%s\t%s\n" % (digest, owner))
+
+
+def file_digest(filename):
+    """
+        Gets the SHA-1 digest of the contents of a file
+
+        Args:
+            filename(:class:`str`): File to read
+
+        Returns:
+            :class:`str` Hex digest
+    """
+    digest = hashlib.sha1()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(DEFAULT_CHUNK_SIZE), ""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ImageManifest(object):
+    """
+        Persistent record of the images downloaded from a gallery, keyed
+        by the link of each image page and the directory it was saved in,
+        since the same image may appear loose and in albums. Entries hold
+        the URL of the full size image and the name, size and digest of
+        the downloaded file, so later runs need not fetch the pages of
+        images already on disk. Entries are appended to the file as images
+        are downloaded; the last entry for a link and directory wins
+
+        Args:
+            path(:class:`str`): Directory the gallery is stored under
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.filename = os.path.join(path, MANIFEST_FILE)
+        self.entries = {}
+        self.urls = {}
+        self.lock = threading.Lock()
+        if os.path.exists(self.filename):
+            with open(self.filename, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Line cut short by an interrupted run
+                        continue
+                    self.record(entry)
+
+    def directory(self, filename):
+        """
+            Gets the directory of a file in the form used as a key
+
+            Args:
+                filename(:class:`str`): File in the gallery
+
+            Returns:
+                :class:`str` Normalized directory of the file
+        """
+        return os.path.normpath(os.path.dirname(filename))
+
+    def record(self, entry):
+        """
+            Indexes an entry read from or added to the manifest
+
+            Args:
+                entry(:class:`dict`): Entry of an image
+        """
+        filename = os.path.join(self.path, entry["filename"])
+        self.entries[(entry["link"], self.directory(filename))] = entry
+        self.urls[entry["link"]] = entry["url"]
+
+    def image_url(self, link):
+        """
+            Gets the full size image of an image page saved in any
+            directory
+
+            Args:
+                link(:class:`str`): Link of the image page
+
+            Returns:
+                :class:`str` URL of the image; None if not recorded
+        """
+        return self.urls.get(link)
+
+    def downloaded(self, link, path):
+        """
+            Checks that an image was downloaded to a directory and its
+            file is unchanged
+
+            Args:
+                link(:class:`str`): Link of the image page
+                path(:class:`str`): Directory the image is saved in
+
+            Returns:
+                :class:`boolean` True if the file exists with the recorded
+                    size, false otherwise
+        """
+        entry = self.entries.get((link, os.path.normpath(path)))
+        if not entry:
+            return False
+        filename = os.path.join(self.path, entry["filename"])
+        return os.path.exists(filename) and \
+            os.path.getsize(filename) == entry["size"]
+
+    def add(self, link, url, filename, digest=None):
+        """
+            Records a downloaded image
+
+            Args:
+                link(:class:`str`): Link of the image page
+                url(:class:`str`): URL of the full size image
+                filename(:class:`str`): File the image was saved to
+
+            Kwargs:
+                digest(:class:`str`): Digest of the file if already known
+        """
+        entry = {"link": link, "url": url,
+                 "filename": os.path.relpath(filename, self.path),
+                 "size": os.path.getsize(filename),
+                 "digest": digest or file_digest(filename)}
+        with self.lock:
+            self.record(entry)
+            with open(self.filename, "ab") as f:
+                f.write(json.dumps(entry, sort_keys=True) + "\n")
+
+
+class ImageStore(object):
     """
-        Handles the parallel scraping of image links
+        Content addressed store of image files shared between archives.
+        Each distinct image is kept once, named by its digest, and the
+        files of each gallery are hard links to it. Symbolic links are
+        used where hard links are not possible, and copies where neither
+        is. The URL each image was downloaded from is recorded, so images
+        already held are not downloaded again
 
         Args:
-            link(:class:`str`): URL to get image link from
-            link_queue(:class:`Queue.Queue`): Queue to place image
-                link in on completion
-            err_queue(:class:`Queue.Queue`): Queue to place exceptions in
-                on failure
-            logger(:class:`logger`): Logging object
+            path(:class:`str`): Directory to keep the store in
     """
 
-    def __init__(self, link, link_queue, err_queue, logger):
-        self.link = link
-        self.link_queue = link_queue
-        self.err_queue = err_queue
-        self.logger = logger
-        threading.Thread.__init__(self)
+    def __init__(self, path):
+        self.path = path
+        self.filename = os.path.join(path, STORE_INDEX_FILE)
+        self.urls = {}
+        self.lock = threading.Lock()
+        if not os.path.exists(path):
+            os.makedirs(path)
+        if os.path.exists(self.filename):
+            with open(self.filename, "rb") as f:
+                for line in f:
+                    url, _, digest = line.rstrip("\n").partition("\t")
+                    if digest:
+                        self.urls[url] = digest
 
-    def run(self):
-        imgpg = requests.get(str(self.link), headers=HEADERS)
-        if imgpg.status_code != 200:
-            self.logger.error("Could not access %s (%d)", self.link,
-                              imgpg.status_code)
-            self.err_queue.put(IOError)
+    def object_path(self, digest):
+        """
+            Gets the file holding an image in the store
+
+            Args:
+                digest(:class:`str`): Digest of the image
+
+            Returns:
+                :class:`str` Path of the stored image
+        """
+        return os.path.join(self.path, digest[:2], digest)
+
+    def lookup(self, url):
+        """
+            Finds a stored image by the URL it was downloaded from
+
+            Args:
+                url(:class:`str`): URL of the image
+
+            Returns:
+                :class:`str` Digest of the image; None if it is not stored
+        """
+        digest = self.urls.get(url)
+        if digest and os.path.exists(self.object_path(digest)):
+            return digest
+        return None
+
+    def place(self, digest, filename):
+        """
+            Creates a file linked to a stored image
+
+            Args:
+                digest(:class:`str`): Digest of the image
+                filename(:class:`str`): File to create
+        """
+        source = self.object_path(digest)
+        try:
+            os.link(source, filename)
             return
-        im_soup = BeautifulSoup(imgpg.content, 'html.parser')
-        im = im_soup.find("img", class_="full-image")
-        self.link_queue.put("http:" + im.attrs["src"])
+        except (AttributeError, OSError):
+            pass
+        try:
+            os.symlink(os.path.abspath(source), filename)
+            return
+        except (AttributeError, OSError):
+            pass
+        shutil.copy2(source, filename)
+
+    def add(self, url, filename):
+        """
+            Moves a downloaded image into the store, replacing it with a
+            link. If the store already holds the same image the download
+            is discarded
+
+            Args:
+                url(:class:`str`): URL the image was downloaded from
+                filename(:class:`str`): File holding the image
+
+            Returns:
+                :class:`str` Digest of the image
+        """
+        digest = file_digest(filename)
+        stored = self.object_path(digest)
+        with self.lock:
+            if os.path.exists(stored):
+                os.remove(filename)
+            else:
+                if not os.path.exists(os.path.dirname(stored)):
+                    os.makedirs(os.path.dirname(stored))
+                shutil.move(filename, stored)
+            self.place(digest, filename)
+            if self.urls.get(url) != digest:
+                self.urls[url] = digest
+                with open(self.filename, "ab") as f:
+                    f.write("%s\t%s\n" % (url, digest))
+        return digest
 
 
 class Archiver(threading.Thread):
@@ -99,17 +1280,91 @@ class Archiver(threading.Thread):
             thread_cb(:class:`function`): Function to call when thread completes
             progress_label(:class:`tk.StringVar`): Location to write updates
                 to for the GUI
+
+        Kwargs:
+            pool_size(:class:`int`): Number of hosts to keep pooled
+                connections for
+            host_connections(:class:`int`): Maximum number of simultaneous
+                connections to a single host
+            workers(:class:`int`): Number of worker threads for parallel
+                requests
+            prefetch(:class:`int`): Number of pages to request concurrently
+                ahead of the page being parsed
+            parser(:class:`str`): BeautifulSoup parser to use, such as
+                lxml or html.parser; None for the fastest available
+            resume(:class:`boolean`): Continue from the checkpoint left by
+                an interrupted run
+            cache_dir(:class:`str`): Directory to cache pages in; None to
+                disable the cache
+            cache_size(:class:`int`): Maximum bytes of pages to cache
+            cache(:class:`ResponseCache`): Cache shared with other
+                archivers; None to create one in `cache_dir`
+            incremental(:class:`boolean`): Only fetch content newer than
+                an existing archive
+            session(:class:`requests.Session`): Session shared with other
+                archivers; None to create one. A shared session is not
+                closed on cleanup
+            pool(:class:`WorkerPool`): Worker pool shared with other
+                archivers; None to create one. A shared pool is not shut
+                down on cleanup
+            processes(:class:`int`): Number of processes to fetch and parse
+                pages in; 0 or 1 to parse pages in this process
+            max_rate(:class:`float`): Highest requests per second
+            rate_limiter(:class:`RateLimiter`): Limiter shared with other
+                archivers; None to create one reaching `max_rate`
+            retries(:class:`int`): Number of times a request is retried
+                after a connection error or a status in `RETRY_STATUSES`
+            metrics_file(:class:`str`): File to write the metrics to on
+                cleanup, as Prometheus text if it ends in .prom and as JSON
+                otherwise; None to only log them
+            profile(:class:`boolean`): Profile :func:`run` with
+                :func:`profiled`
+            chunk_size(:class:`int`): Bytes read from the network at a
+                time when downloading images
     """
 
-    def __init__(self, maximum, size, path, verbose, thread_cb, progress_label):
+    def __init__(self, maximum, size, path, verbose, thread_cb, progress_label,
+                 pool_size=DEFAULT_POOL_SIZE,
+                 host_connections=DEFAULT_HOST_CONNECTIONS,
+                 workers=DEFAULT_WORKERS, prefetch=DEFAULT_PREFETCH,
+                 parser=None, resume=False, cache_dir=None,
+                 cache_size=DEFAULT_CACHE_SIZE, cache=None, incremental=False,
+                 session=None, pool=None, processes=0,
+                 max_rate=DEFAULT_MAX_RATE, rate_limiter=None,
+                 retries=DEFAULT_RETRIES, metrics_file=None, profile=False,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
         self.maximum = maximum if maximum else None
+        self.processes = processes
+        self.limiter = rate_limiter or RateLimiter(max_rate=max_rate)
+        self.retries = retries
+        self.resume = resume
+        self.incremental = incremental
+        self.prefetch = max(1, prefetch)
         self.size = size
         self.path = path
         self.logger_init(logging.DEBUG if verbose else logging.WARN)
+        self.parser = self.parser_init(parser)
         self.stoprequest = threading.Event()
         self.thread_cb = thread_cb
         self.progress_label = progress_label
+        self.owns_session = session is None
+        self.session = session or self.session_init(pool_size,
+                                                    host_connections)
+        self.cache = cache
+        if cache is None and cache_dir:
+            self.cache = ResponseCache(cache_dir, cache_size, self.logger)
+        self.owns_pool = pool is None
+        self.pool = pool or WorkerPool(workers)
+        self.metrics = Metrics()
+        self.metrics_file = metrics_file
+        self.chunk_size = max(1, chunk_size)
+        self.downloads = {}
+        self.downloads_lock = threading.Lock()
         threading.Thread.__init__(self)
+        if profile:
+            # Shadows the run method of the class, so the profiler is also
+            # started when run is called by the thread
+            self.run = functools.partial(self.profiled, self.run)
         self.logger.debug("Version: %s", VERSION)
 
     def verify(self):
@@ -133,12 +1388,51 @@ class Archiver(threading.Thread):
             Performs final actions on thread completion
         """
         self.write_update("Complete!")
+        self.logger.info(self.metrics.summary())
+        if self.metrics_file:
+            try:
+                self.metrics.dump(self.metrics_file)
+            except IOError:
+                self.logger.error("Failed to write metrics to %s",
+                                  self.metrics_file)
+        if self.owns_pool:
+            self.pool.shutdown()
+        if self.owns_session:
+            self.session.close()
         if self.thread_cb:
             try:
                 self.thread_cb()
             except RuntimeError:
                 self.logger.warn("Window closed while scraping active")
 
+    def profiled(self, func, *args):
+        """
+            Calls a function under both a deterministic profiler and a
+            stack sampler. The profile of the calling thread is written to
+            `PROFILE_STATS_FILE` and the sampled stacks of all threads to
+            `PROFILE_STACKS_FILE`, next to the log
+
+            Args:
+                func(:class:`function`): Function to call
+                args: Arguments to call the function with
+
+            Returns:
+                Value returned by the function
+        """
+        profiler = cProfile.Profile()
+        sampler = StackSampler()
+        sampler.start()
+        profiler.enable()
+        try:
+            return func(*args)
+        finally:
+            profiler.disable()
+            sampler.stop()
+            profiler.dump_stats(PROFILE_STATS_FILE)
+            sampler.write(PROFILE_STACKS_FILE)
+            self.logger.info("Wrote profile to %s and %s",
+                             PROFILE_STATS_FILE, PROFILE_STACKS_FILE)
+
     def write_update(self, update):
         if self.progress_label:
             try:
@@ -157,23 +1451,139 @@ class Archiver(threading.Thread):
 
     def logger_init(self, level):
         """
-            Initializes a logger to write to the console and a file
+            Initializes a logger to write to the console and a file. The
+            handlers are only added once per process, so archivers created
+            after the first reuse them and take over the console level.
+            The log file is truncated when the handlers are added, so it
+            holds everything logged since the program started rather than
+            the last archive alone
 
             Args:
                 level(:class:`int`): Log level for the console
         """
         self.logger = logging.getLogger()
-        self.logger.setLevel(logging.DEBUG)
-        console_handler = logging.StreamHandler()
-        file_handler = logging.FileHandler("archive.log", mode="w")
-        formatter = logging.Formatter('%(asctime)s %(levelname)-8s %(message)s')
-        console_handler.setFormatter(formatter)
-        file_handler.setFormatter(formatter)
-        console_handler.setLevel(level)
-        file_handler.setLevel(logging.DEBUG)
-
-        self.logger.addHandler(console_handler)
-        self.logger.addHandler(file_handler)
+        with logger_lock:
+            if self.logger.handlers:
+                for handler in self.logger.handlers:
+                    if not isinstance(handler, logging.FileHandler):
+                        handler.setLevel(level)
+                return
+            self.logger.setLevel(logging.DEBUG)
+            console_handler = logging.StreamHandler()
+            file_handler = logging.FileHandler("archive.log", mode="w")
+            formatter = logging.Formatter(
+                '%(asctime)s %(levelname)-8s %(message)s')
+            console_handler.setFormatter(formatter)
+            file_handler.setFormatter(formatter)
+            console_handler.setLevel(level)
+            file_handler.setLevel(logging.DEBUG)
+
+            self.logger.addHandler(console_handler)
+            self.logger.addHandler(file_handler)
+
+    def parser_init(self, parser):
+        """
+            Selects the parser used for all html, falling back to the
+            parser bundled with Python if the requested one is unavailable
+
+            Args:
+                parser(:class:`str`): Name of the parser; None for default
+
+            Returns:
+                :class:`str` Name of the parser to use
+        """
+        parser = parser or DEFAULT_PARSER
+        try:
+            BeautifulSoup("", parser)
+        except FeatureNotFound:
+            self.logger.warn("Parser %s unavailable, using %s", parser,
+                             FALLBACK_PARSER)
+            parser = FALLBACK_PARSER
+        self.logger.debug("Parser: %s", parser)
+        return parser
+
+    def make_soup(self, markup):
+        """
+            Parses html with the selected parser
+
+            Args:
+                markup(:class:`str`): Html to parse
+
+            Returns:
+                :class:`BeautifulSoup` Parsed html
+        """
+        with self.metrics.timer("parse"):
+            return BeautifulSoup(markup, self.parser)
+
+    def session_init(self, pool_size, host_connections):
+        """
+            Creates the HTTP session shared by all requests of the archiver.
+            Connections are kept alive and reused between requests
+
+            Args:
+                pool_size(:class:`int`): Number of hosts to keep pooled
+                    connections for
+                host_connections(:class:`int`): Maximum number of
+                    simultaneous connections to a single host
+
+            Returns:
+                :class:`requests.Session` Session to make requests with
+        """
+        return make_session(pool_size, host_connections)
+
+    def fetch(self, url, **kwargs):
+        """
+            Performs a GET request using the shared session, paced by the
+            rate limiter. Connection errors and responses with a status in
+            `RETRY_STATUSES` are retried after the delay given by the
+            server, or a random backoff if it gives none
+
+            Args:
+                url(:class:`str`): URL to request
+
+            Kwargs:
+                Passed through to :func:`requests.Session.get`
+
+            Returns:
+                :class:`requests.Response` Response to the request; the
+                    last failed response once retries are exhausted
+
+            Raises:
+                :class:`requests.RequestException`: The request failed on
+                    every attempt
+        """
+        for attempt in itertools.count():
+            self.limiter.acquire()
+            self.metrics.count("requests")
+            try:
+                with self.metrics.timer("fetch"):
+                    response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.retries:
+                    raise
+                error, response, delay = e, None, None
+                reason = e.__class__.__name__
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    self.limiter.success()
+                    return response
+                if attempt >= self.retries:
+                    return response
+                delay = retry_after(response)
+                reason = "status %d" % response.status_code
+
+            self.metrics.count("retries")
+            self.limiter.backoff(delay)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            self.logger.warn("Retrying %s in %.1fs after %s", url, delay,
+                             reason)
+            if self.stoprequest.wait(delay):
+                if response is None:
+                    raise error
+                return response
+            if response is not None:
+                response.close()
 
     def get_mods(self, post):
         """
@@ -203,41 +1613,286 @@ class Archiver(threading.Thread):
                 :class:`IOError`: The page returned a bad status
         """
         self.logger.debug("Getting page at %s", url)
-        page = requests.get(url, headers=HEADERS)
+        return self.make_soup(self.get_content(url))
+
+    def get_content(self, url):
+        """
+            Downloads a URL, using the cached copy if the server reports
+            it has not changed
+
+            Args:
+                url(:class:`str`): URL to download
+
+            Returns:
+                :class:`str` Body of the page
+
+            Raises:
+                :class:`IOError`: The page returned a bad status
+        """
+        cached = self.cache.get(url) if self.cache else None
+        headers = {}
+        if cached:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+        page = self.fetch(url, headers=headers)
+        if page.status_code == 304 and cached:
+            self.logger.debug("Using cached page for %s", url)
+            self.metrics.count("cache_hits")
+            return cached["body"]
         if page.status_code != 200:
             self.logger.error("Failed to get page %s (%d)", url,
                               page.status_code)
             raise IOError
-        return BeautifulSoup(page.content, 'html.parser')
+        etag = page.headers.get("ETag")
+        last_modified = page.headers.get("Last-Modified")
+        if self.cache and (etag or last_modified):
+            self.cache.put(url, page.content, etag, last_modified)
+        self.metrics.count("bytes", len(page.content))
+        return page.content
+
+    def page_urls(self, base_url, last=None, first=1):
+        """
+            Generates the URLs of numbered pages
+
+            Args:
+                base_url(:class:`str`): URL the page number is appended to
+
+            Kwargs:
+                last(:class:`int`): Last page number; None for no limit
+                first(:class:`int`): First page number
+
+            Returns:
+                :class:`generator` URLs starting at page `first`
+        """
+        if last is None:
+            pages = itertools.count(first)
+        else:
+            pages = xrange(first, last + 1)
+        return (base_url + str(page_num) for page_num in pages)
+
+    def prefetch_page(self, url):
+        """
+            Downloads and parses a URL unless the thread has been asked
+            to stop
+
+            Args:
+                url(:class:`str`): URL to download
+
+            Returns:
+                :class:`BeautifulSoup` Parsed page at URL; None if stopped
+
+            Raises:
+                :class:`IOError`: The page returned a bad status
+        """
+        if self.stoprequest.isSet():
+            return None
+        return self.get_page(url)
+
+    def fetch_pages(self, urls, count_items=None):
+        """
+            Downloads and parses pages concurrently on the worker pool,
+            yielding them in order. No more than `prefetch` pages are in
+            flight at once, and no new pages are requested once the thread
+            has been asked to stop
+
+            Args:
+                urls(:class:`iterable`): URLs to download; may be unbounded
+
+            Kwargs:
+                count_items(:class:`function`): Function giving the number
+                    of items on a page, for feeds that end at an empty
+                    page. Pages in flight start at one and double with
+                    each full page. A page holding fewer items than the
+                    fullest so far, likely the last, drops them back to
+                    one, and the feed ends at the first empty page
+
+            Returns:
+                :class:`generator` Parsed pages in the order of the URLs
+
+            Raises:
+                :class:`IOError`: A page returned a bad status
+        """
+        urls = iter(urls)
+        pending = collections.deque()
+        window = 1 if count_items else self.prefetch
+        per_page = 0
+        while True:
+            while len(pending) < window and not self.stoprequest.isSet():
+                url = next(urls, None)
+                if url is None:
+                    break
+                pending.append(self.pool.submit(self.prefetch_page, url))
+            if not pending:
+                return
+            page = pending.popleft().result()
+            if page is None:
+                return
+            if count_items:
+                items = count_items(page)
+                if not items:
+                    yield page
+                    return
+                if items < per_page:
+                    window = 1
+                else:
+                    per_page = items
+                    window = min(self.prefetch, window * 2)
+            yield page
+
+    def load_checkpoint(self, checkpoint, url):
+        """
+            Gets the progress to resume from if resuming is enabled
+
+            Args:
+                checkpoint(:class:`Checkpoint`): Checkpoint of the output
+                url(:class:`str`): URL being crawled; progress saved for a
+                    different URL is ignored
+
+            Returns:
+                :class:`dict` Saved progress; None to start from the beginning
+        """
+        if not self.resume:
+            return None
+        state = checkpoint.load()
+        if not state or state.get("url") != url:
+            self.logger.debug("No checkpoint to resume from")
+            return None
+        self.logger.debug("Resuming after page %d", state["page"])
+        return state
+
+    def image_filename(self, url, path):
+        """
+            Gets the file an image is saved to
+
+            Args:
+                url(:class:`str`): URL of the image
+                path(:class:`str`): Path images are stored at
+
+            Returns:
+                :class:`str` Path of the image file
+        """
+        return os.path.join(path,
+                            os.path.split(urlparse.urlparse(url).path)[-1])
 
     def download_image(self, url, path):
         """
-            Downloads an image at a given URL
+            Downloads an image at a given URL. The image is written to a
+            `PART_SUFFIX` file that is renamed once its size matches the
+            size reported by the server, so a file with the final name is
+            always complete. A part file left by an interrupted download is
+            continued with a Range request. Only one worker downloads to a
+            file at a time; others wanting the same file wait for it
 
             Args:
                 url(:class:`str`): URL of image to download
                 path(:class:`str`): Path to store download at
 
+            Returns:
+                :class:`str` File holding the image; None if the thread
+                    has been asked to stop
+
             Raises:
-                :class:`IOError`: The image returned a bad status
+                :class:`IOError`: The image returned a bad status or was
+                    not fully received
+        """
+        if self.stoprequest.isSet():
+            return None
+        filename = self.image_filename(url, path)
+        with self.downloads_lock:
+            active = self.downloads.get(filename)
+            if active is None:
+                self.downloads[filename] = threading.Event()
+        if active is not None:
+            self.logger.debug("Waiting for download of %s", filename)
+            active.wait()
+            return self.download_image(url, path)
+
+        try:
+            if os.path.exists(filename):
+                self.logger.debug("File exists, skipping %s", filename)
+                return filename
+            return self.transfer_image(url, filename)
+        finally:
+            with self.downloads_lock:
+                self.downloads.pop(filename).set()
+
+    def transfer_image(self, url, filename):
         """
-        filename = os.path.split(urlparse.urlparse(url).path)[-1]
-        self.write_update("Downloading image %s" % filename)
-        filename = os.path.join(path, filename)
-        if os.path.exists(filename):
-            self.logger.debug("File exists, skipping %s", filename)
-            return
+            Downloads an image through its part file. Must only be called
+            by the worker that claimed the file in :func:`download_image`
+
+            Args:
+                url(:class:`str`): URL of image to download
+                filename(:class:`str`): File to save the image to
+
+            Returns:
+                :class:`str` File holding the image
 
-        self.logger.debug("Downloading image at %s to %s", url, filename)
-        r = requests.get(url, stream=True, headers=HEADERS)
-        if r.status_code != 200:
+            Raises:
+                :class:`IOError`: The image returned a bad status or was
+                    not fully received
+        """
+        part = filename + PART_SUFFIX
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = {}
+        if offset:
+            self.logger.debug("Resuming %s at %d bytes", filename, offset)
+            headers["Range"] = "bytes=%d-" % offset
+        else:
+            self.logger.debug("Downloading image at %s to %s", url, filename)
+        r = self.fetch(url, stream=True, headers=headers)
+        content_range = CONTENT_RANGE_RE.match(
+            r.headers.get("Content-Range", ""))
+        if r.status_code == 206 and content_range and \
+                int(content_range.group(1)) == offset:
+            mode = "ab"
+            expected = content_range.group(2)
+            expected = None if expected == "*" else int(expected)
+        elif r.status_code == 200:
+            # Also sent by servers that ignore the Range header
+            mode = "wb"
+            expected = r.headers.get("Content-Length")
+            expected = int(expected) if expected else None
+        elif offset and r.status_code in (206, 416):
+            r.close()
+            if r.status_code == 416 and \
+                    r.headers.get("Content-Range", "").endswith("/%d" % offset):
+                self.logger.debug("Part file of %s is complete", filename)
+                os.rename(part, filename)
+                return filename
+            self.logger.warn("Cannot resume %s, restarting", filename)
+            os.remove(part)
+            return self.transfer_image(url, filename)
+        else:
             self.logger.error("Failed to get image %s (%d)", url,
                               r.status_code)
             raise IOError
-
-        with open(filename, "wb") as f:
-            for chunk in r:
+        if r.headers.get("Content-Encoding", "identity") != "identity":
+            # Lengths are of the encoded body, not the decoded file
+            expected = None
+
+        received = 0
+        write_time = 0.0
+        with open(part, mode, 0) as f:
+            for chunk in r.iter_content(self.chunk_size):
+                start = time.time()
                 f.write(chunk)
+                write_time += time.time() - start
+                received += len(chunk)
+        self.metrics.observe("write", write_time)
+        self.metrics.count("bytes", received)
+
+        size = os.path.getsize(part)
+        if expected is not None and size != expected:
+            self.logger.error("Incomplete download of %s (%d of %d bytes)",
+                              filename, size, expected)
+            if size > expected:
+                os.remove(part)
+            raise IOError
+        os.rename(part, filename)
+        return filename
 
     def check_path(self, path):
         """
@@ -257,22 +1912,6 @@ class Archiver(threading.Thread):
                 if not os.path.exists(path_base):
                     os.mkdir(path_base)
 
-    def write_posts(self, posts, filename, path):
-        """
-            Writes a string of posts to an html file
-
-            Args:
-                posts(:class:`str`): String to write to file
-                filename(:class:`str`): Name of file to write
-                path(:class:`str`): Path to write file to
-        """
-        write_loc = os.path.join(path, filename + ".html")
-        self.logger.debug("Writing posts to %s", write_loc)
-        with open(write_loc, "wb") as f:
-            f.write("<body>")
-            f.write(posts.encode("utf8"))
-            f.write("</body>")
-
 
 class UserArchiver(Archiver):
     """
@@ -291,17 +1930,36 @@ class UserArchiver(Archiver):
             thread_cb(:class:`function`): Function to call when thread completes
             progress_label(:class:`tk.StringVar`): Location to write updates
                 to for the GUI
+
+        Kwargs:
+            digests(:class:`DigestIndex`): Index shared between archives;
+                posts it records as held by another archive are skipped
+            site_url(:class:`str`): Base URL of the site to scrape
+            image_store(:class:`ImageStore`): Store to keep downloaded
+                images in, shared between archives; None to save images
+                directly in the gallery folders
+            album_jobs(:class:`int`): Number of image albums crawled at
+                the same time, sharing the workers of the archive
+            Others are passed through to :class:`Archiver`
     """
 
 
     def __init__(self, maximum, size, path, verbose, username, thread_cb,
-                 progress_label):
+                 progress_label, digests=None, site_url=SITE_URL,
+                 image_store=None, album_jobs=DEFAULT_ALBUM_JOBS, **kwargs):
         self.username = username
-        self.news_url = "https://roosterteeth.com/user/" + username
+        self.digests = digests
+        self.image_store = image_store
+        self.album_jobs = max(1, album_jobs)
+        self.site_url = site_url
+        self.news_url = site_url + "/user/" + username
         self.friends_url = self.news_url + "/friends"
         self.img_url = self.news_url + "/images"
+        self.images_downloaded = 0
+        self.images_lock = threading.Lock()
+        self.manifest = None
         super(UserArchiver, self).__init__(maximum, size, path, verbose,
-                                           thread_cb, progress_label)
+                                           thread_cb, progress_label, **kwargs)
 
         self.path = os.path.join(self.path, self.username)
 
@@ -315,7 +1973,7 @@ class UserArchiver(Archiver):
             Raises:
                 :class:`IOError` An unknown network error occured
         """
-        r = requests.get(self.news_url, headers=HEADERS)
+        r = self.fetch(self.news_url)
         if r.status_code == 200:
             self.logger.debug("User %s exists", self.username)
             return True
@@ -353,28 +2011,13 @@ class UserArchiver(Archiver):
                 element(:class:`BeautifulSoup`): Post to be formatted
 
             Returns:
-                :class:`str` Formatted string to write to file
+                :class:`unicode` Formatted string to write to file
         """
-        mods = self.get_mods(element)
-        title = self.get_journal_title(element)
-        body = element.find("div", class_="post-content").decode_contents()
-        body = body.encode('utf8', 'ignore')
-        post_soup = BeautifulSoup("", "html.parser")
-
-        header_tag = post_soup.new_tag("h3")
-        header_tag.string = title
-        post_soup.append(header_tag)
-
-        post_soup.append(BeautifulSoup(body, "html.parser"))
-
-        mod_tag = post_soup.new_tag("p")
-        mod_tag.append(post_soup.new_tag("em"))
-        mod_tag.em.string = "Mods: %d" % mods
-        post_soup.append(mod_tag)
-
-        post_soup.append(post_soup.new_tag("hr"))
-
-        return post_soup.prettify()
+        with self.metrics.timer("format"):
+            mods = self.get_mods(element)
+            title = self.get_journal_title(element)
+            body = element.find("div", class_="post-content").decode_contents()
+            return JOURNAL_TEMPLATE.format(title=title, body=body, mods=mods)
 
     def write_friends(self, friends):
         """
@@ -391,7 +2034,7 @@ class UserArchiver(Archiver):
 
         path = os.path.join(base_path, "friends.txt")
         self.logger.debug("Writing posts to %s", path)
-        with open(path, "wb") as f:
+        with open(path, "wb") as f, self.metrics.timer("write"):
             for friend in friends:
                 f.write(friend + "\n")
 
@@ -403,9 +2046,11 @@ class UserArchiver(Archiver):
         friends = []
         page_num = 1
         try:
-            while True:
+            pages = self.fetch_pages(
+                self.page_urls(friends_base_url),
+                lambda page: len(page.findAll("p", class_="name")))
+            for page in pages:
                 self.write_update("Scraping friends page %d" % page_num)
-                page = self.get_page(friends_base_url + str(page_num))
                 elements = page.findAll("p", class_="name")
                 if len(elements) == 0:
                     break
@@ -425,88 +2070,365 @@ class UserArchiver(Archiver):
         self.write_update("Found %d friends. Writing to file" % len(friends))
         self.write_friends(friends)
 
-    def write_journals(self, journals):
+    def journal_path(self):
         """
-            Writes all journals in a list to files
+            Gets the directory journals are written to, creating it if needed
 
-            Args(:class:`list`): List of formatted html strings to write
+            Returns:
+                :class:`str` Path to the journal directory
         """
-        page_num = 1
         if self.path:
             base_path = os.path.join(self.path, "journals")
         else:
             base_path = os.path.join(self.username, "journals")
         self.check_path(base_path)
+        return base_path
+
+    def post_digest(self, body):
+        """
+            Gets a digest identifying a journal. Whitespace is collapsed
+            first so layout changes do not alter the digest
+
+            Args:
+                body(:class:`unicode`): Html content of the journal
+
+            Returns:
+                :class:`str` Hex SHA-1 digest of the content
+        """
+        normalized = u" ".join(body.split())
+        return hashlib.sha1(normalized.encode("utf8")).hexdigest()
+
+    def is_duplicate(self, digest, seen):
+        """
+            Checks if a journal was already found by this run or is held
+            by another archive, recording it if not
+
+            Args:
+                digest(:class:`str`): Digest of the journal
+                seen(:class:`set`): Digests found so far by this run
+
+            Returns:
+                :class:`boolean` True if the journal should be skipped
+        """
+        if digest in seen:
+            self.logger.debug("Found duplicate post %s", digest)
+            return True
+        seen.add(digest)
+        if self.digests:
+            owner = self.digests.owner(digest)
+            if owner and owner != self.news_url:
+                self.logger.debug("Post %s is archived by %s", digest, owner)
+                return True
+            self.digests.add(digest, self.news_url)
+        return False
+
+    def format_entry(self, digest, element):
+        """
+            Formats a journal along with the marker identifying it in the
+            archive
+
+            Args:
+                digest(:class:`str`): Digest of the journal
+                element(:class:`BeautifulSoup`): Journal to be formatted
+
+            Returns:
+                :class:`unicode` Formatted string to write to file
+        """
+        return (JOURNAL_MARKER.format(digest=digest) +
+                self.format_journal(element))
+
+    def archived_posts(self, path, last=None):
+        """
+            Reads back the journals in an archive, one file at a time
+
+            Args:
+                path(:class:`str`): Journal directory
+
+            Kwargs:
+                last(:class:`int`): Number of the last file to read; None
+                    to read all files
+
+            Returns:
+                :class:`generator` Tuples of the digest and formatted html
+                    of each journal, newest first
+        """
+        file_num = 1
+        while last is None or file_num <= last:
+            filename = os.path.join(path, str(file_num) + ".html")
+            if not os.path.exists(filename):
+                return
+            with open(filename, "rb") as f:
+                content = f.read().decode("utf8")
+            if content.startswith(u"<body>"):
+                content = content[len(u"<body>"):]
+            if content.endswith(u"</body>"):
+                content = content[:-len(u"</body>")]
+            for post in re.split(u"\n(?=<!-- post:)", content):
+                match = JOURNAL_MARKER_RE.match(post)
+                if match:
+                    yield match.group(1), post
+            file_num += 1
+
+    def load_index(self, path):
+        """
+            Reads the digests of the journals in an archive
+
+            Args:
+                path(:class:`str`): Journal directory
+
+            Returns:
+                :class:`list` Digests, newest first; None if no index exists
+        """
+        try:
+            with open(os.path.join(path, INDEX_FILE), "rb") as f:
+                digests = f.read().split()
+        except IOError:
+            return None
+        return digests or None
+
+    def write_index(self, path, last=None):
+        """
+            Records the digests of the journals in an archive
+
+            Args:
+                path(:class:`str`): Journal directory
+
+            Kwargs:
+                last(:class:`int`): Number of the last file of the archive;
+                    None if all files belong to it
+        """
+        digests = [digest for digest, _ in self.archived_posts(path, last)]
+        with open(os.path.join(path, INDEX_FILE), "wb") as f:
+            f.write("\n".join(digests))
+
+    def activity_pages(self, news_only, first):
+        """
+            Walks the activity feed until it reaches an empty or short page
+
+            Args:
+                news_only(:class:`boolean`): Only return posts tagged as News
+                first(:class:`int`): Page to start from
+
+            Returns:
+                :class:`generator` Tuples of the page number and a list of
+                    (body, element) tuples for the posts on that page
+        """
+        journal_base_url = self.news_url + "?page="
+        page_num = first
+        pages = self.fetch_pages(
+            self.page_urls(journal_base_url, first=first),
+            lambda page: len(page.findAll("div", class_="media-content")))
+        for activity in pages:
+            self.write_update("Scraping journal page %d" % page_num)
+            elements = activity.findAll("div", class_="media-content")
+            if not elements:
+                return
+            posts = []
+            for element in elements:
+                """ Only save news posts """
+                post_tag = element.find("p", class_="post-tag-label")
+                if not post_tag:
+                    continue
+                if news_only and post_tag.text != "News":
+                    continue
+                body = element.find("div", class_="post-content")
+                posts.append((body.decode_contents(), element))
+            yield page_num, posts
+            page_num += 1
+
+    def archive_posts(self, news_only, label):
+        """
+            Finds and writes all posts from the activity feed
+
+            Args:
+                news_only(:class:`boolean`): Only save posts tagged as News
+                label(:class:`str`): Name of the posts for log messages
+        """
+        path = self.journal_path()
+        checkpoint = Checkpoint(path)
+        if self.incremental:
+            index = self.load_index(path)
+            if index and checkpoint.load():
+                # The archive is partly rewritten, so the index cannot
+                # say where it ends
+                self.logger.debug("Previous run of %s was interrupted, "
+                                  "not syncing", label)
+            elif index:
+                self.sync_posts(news_only, label, path, index)
+                return
+            else:
+                self.logger.debug("No index of archived %s, scraping all",
+                                  label)
+
+        journal_base_url = self.news_url + "?page="
+        seen = set()
+        num_journals = 0
+        page_num = 1
+        writer = PostWriter(path, self.size, self.logger,
+                            metrics=self.metrics)
+        state = self.load_checkpoint(checkpoint, journal_base_url)
+        if state:
+            writer.resume(**state["writer"])
+            page_num = state["page"] + 1
+            num_journals = state["count"]
+            # Rebuild the digests of the archived posts so duplicate
+            # detection covers them as well as the posts still to come
+            seen.update(digest for digest, _ in
+                        self.archived_posts(path, writer.file_num))
+            if len(seen) < num_journals:
+                self.logger.warn("Only %d of %d archived %s could be read "
+                                 "back; duplicates of the others will not "
+                                 "be detected", len(seen), num_journals,
+                                 label)
+        complete = False
+        try:
+            for page_num, posts in self.activity_pages(news_only, page_num):
+                for body, element in posts:
+                    digest = self.post_digest(body)
+                    if self.is_duplicate(digest, seen):
+                        continue
+                    num_journals += 1
+                    writer.add(self.format_entry(digest, element))
+                    if self.maximum is not None and \
+                            num_journals >= self.maximum:
+                        raise LimitReached
+
+                checkpoint.save(url=journal_base_url, page=page_num,
+                                count=num_journals, writer=writer.state())
+                if self.stoprequest.isSet():
+                    self.logger.debug("Halting due to join request")
+                    break
+            else:
+                complete = not self.stoprequest.isSet()
+
+        except LimitReached:
+            complete = True
+        finally:
+            writer.close()
+
+        if complete:
+            checkpoint.clear()
+            self.write_index(path, writer.file_num)
+        self.logger.debug("Wrote %d %s to %d files", writer.total, label,
+                          writer.file_num)
+
+    def sync_posts(self, news_only, label, path, index):
+        """
+            Adds posts newer than an existing archive to the front of it.
+            Paging stops at the first page holding only archived posts.
+            The maximum is not applied, since merging only some of the new
+            posts would leave a gap the next sync could not detect
+
+            Args:
+                news_only(:class:`boolean`): Only save posts tagged as News
+                label(:class:`str`): Name of the posts for log messages
+                path(:class:`str`): Journal directory
+                index(:class:`list`): Digests of the archived posts
+        """
+        known = set(index)
+        new_posts = []
+        seen = set()
+        if self.maximum is not None:
+            self.logger.warn("Maximum ignored while syncing %s", label)
+        for page_num, posts in self.activity_pages(news_only, 1):
+            page_known = 0
+            page_new = 0
+            for body, element in posts:
+                digest = self.post_digest(body)
+                if digest in known:
+                    page_known += 1
+                    continue
+                if self.is_duplicate(digest, seen):
+                    continue
+                new_posts.append(self.format_entry(digest, element))
+                page_new += 1
+
+            if page_known and not page_new:
+                self.logger.debug("Page %d holds only archived %s",
+                                  page_num, label)
+                break
+            if self.stoprequest.isSet():
+                break
 
-        while (page_num - 1) * self.size < len(journals):
-            if page_num * self.size > len(journals):
-                pages = journals[(page_num - 1) * self.size:]
-            else:
-                pages = journals[(page_num - 1) * self.size:
-                                 page_num * self.size]
+        if self.stoprequest.isSet():
+            # Merging would leave a gap the next sync could not detect
+            self.logger.debug("Halting due to join request, archive unchanged")
+            return
+        if not new_posts:
+            self.logger.debug("No new %s", label)
+            return
+        self.merge_posts(path, new_posts)
+        self.logger.debug("Added %d new %s", len(new_posts), label)
 
-            self.logger.debug("Writing %d pages at page %d", len(pages),
-                              page_num)
+    def merge_posts(self, path, new_posts):
+        """
+            Rewrites an archive with new posts ahead of the archived ones,
+            keeping `size` posts in each file
 
-            page = "\n".join(pages)
-            self.write_posts(page, str(page_num), base_path)
-            page_num += 1
+            Args:
+                path(:class:`str`): Journal directory
+                new_posts(:class:`list`): Formatted posts, newest first
+        """
+        merge_path = os.path.join(path, ".sync")
+        self.check_path(merge_path)
+        with PostWriter(merge_path, self.size, self.logger,
+                        metrics=self.metrics) as writer:
+            for post in new_posts:
+                writer.add(post)
+            for _, post in self.archived_posts(path):
+                writer.add(post)
+
+        for name in os.listdir(path):
+            if re.match(r"^\d+\.html$", name):
+                os.remove(os.path.join(path, name))
+        for name in os.listdir(merge_path):
+            os.rename(os.path.join(merge_path, name), os.path.join(path, name))
+        os.rmdir(merge_path)
+        self.write_index(path)
 
     def get_journals(self):
         """
             Finds and writes all journals specified by the class
         """
-        journal_base_url = self.news_url + "?page="
-        hashes = set()
-        journals = []
-        num_journals = 0
-        page_num = 1
-        try:
-            while True:
-                self.write_update("Scraping journal page %d" % page_num)
-                activity = self.get_page(journal_base_url + str(page_num))
-                page_num += 1
-                elements = activity.findAll("div", class_="media-content")
-                if not elements:
-                    break
-                for element in elements:
-                    """ Only save news posts """
-                    post_tag = element.find("p", class_="post-tag-label")
-                    if not post_tag or post_tag.text != "News":
-                        continue
-                    body = element.find("div", class_="post-content")
-                    body = body.decode_contents()
-                    hashes.add(hash(body))
-                    """ Avoid duplicate journals """
-                    if len(hashes) == num_journals:
-                        self.logger.debug("Found duplicate hash")
-                        continue
-                    num_journals += 1
-                    journals.append(self.format_journal(element))
-                    if self.maximum is not None and \
-                            num_journals >= self.maximum:
-                        raise LimitReached
+        self.archive_posts(True, "journals")
 
-                if self.stoprequest.isSet():
-                    self.logger.debug("Halting due to join request")
-                    break
+    def get_image_link(self, link):
+        """
+            Finds the full size image on an image page
 
-        except LimitReached:
-            pass
+            Args:
+                link(:class:`str`): URL of the image page
 
-        self.logger.debug("Preparing to write %d journals", len(journals))
-        self.write_journals(journals)
+            Returns:
+                :class:`str` URL of the image; None if the page has no image
+
+            Raises:
+                :class:`IOError` Error returned on request
+        """
+        im_soup = self.get_page(link)
+        im = im_soup.find("img", class_="full-image")
+        if not im:
+            self.logger.warn("No image found at %s", link)
+            return None
+        return "http:" + im.attrs["src"]
 
-    def get_image_links(self, url):
+    def submit_image_links(self, url, path, album_cb=None):
         """
-            Finds all the image links at a given URL. Stops if all
-            links on page are found, or it reaches a specified max
+            Queues the image pages linked from a URL to have their image
+            links found. Stops if all links on page are queued, or it
+            reaches a specified max
 
             Args:
                 url(:class:`str`): URL to check for image links
+                path(:class:`str`): Directory the images are saved in
+
+            Kwargs:
+                album_cb(:class:`function`): Function to call with the tag
+                    of each album linked from the page; None to ignore
+                    albums
 
             Returns:
-                :class:`list` List of URLs of images to download
+                :class:`list` List of :class:`Task` from :func:`image_task`
 
             Raises:
                 :class:`IOError` Error returned on request
@@ -514,38 +2436,191 @@ class UserArchiver(Archiver):
         soup = self.get_page(url)
         blks = soup.find_all("ul", class_='large-image-blocks')
 
-        link_queue = Queue.Queue()
-        err_queue = Queue.Queue()
-        threads = []
+        tasks = []
 
         for blk in blks:
             for tag in blk.find_all("a"):
                 link = tag.attrs['href']
                 if link.rfind("album") != -1:
+                    if album_cb is None:
+                        break
+                    album_cb(tag)
+                    continue
+                if not self.claim_image():
                     break
-                thread = LinkDownloadThread(str(link), link_queue, err_queue,
-                                            self.logger)
-                thread.start()
+                tasks.append(self.image_task(str(link), path))
 
-                threads.append(thread)
-                if self.maximum is not None:
-                    self.maximum -= 1
+        return tasks
 
-                if self.maximum == 0:
-                    break
+    def claim_image(self):
+        """
+            Counts an image against the maximum, which is shared by all
+            albums being crawled
 
-            if self.maximum == 0:
-                break
+            Returns:
+                :class:`bool` True if the image is within the maximum
+        """
+        with self.images_lock:
+            if self.maximum is None:
+                return True
+            if self.maximum <= 0:
+                return False
+            self.maximum -= 1
+            return True
 
-        for thread in threads:
-            thread.join()
+    def image_manifest(self):
+        """
+            Gets the manifest of the downloaded images of the user,
+            loading it on first use. Albums crawled at the same time all
+            get the same manifest
+
+            Returns:
+                :class:`ImageManifest` Manifest of the user's images
+        """
+        with self.images_lock:
+            if self.manifest is None:
+                self.manifest = ImageManifest(self.images_path())
+            return self.manifest
+
+    def image_task(self, link, path):
+        """
+            Finds the full size image of an image page, using the manifest
+            in place of fetching the page where possible
+
+            Args:
+                link(:class:`str`): URL of the image page
+                path(:class:`str`): Directory the image is saved in
+
+            Returns:
+                :class:`Task` Task resolving to a tuple of the link and the
+                    URL of its image. The URL is None if the image is
+                    already downloaded, and the task resolves to None if
+                    the page has no image
+        """
+        manifest = self.image_manifest()
+        if manifest.downloaded(link, path):
+            return Task.completed((link, None))
+        url = manifest.image_url(link)
+        if url:
+            return Task.completed((link, url))
+        return self.pool.submit(self.resolve_image, link)
+
+    def resolve_image(self, link):
+        """
+            Fetches an image page to find its full size image
+
+            Args:
+                link(:class:`str`): URL of the image page
+
+            Returns:
+                :class:`tuple` The link and the URL of its image; None if
+                    the page has no image
+
+            Raises:
+                :class:`IOError` Error returned on request
+        """
+        url = self.get_image_link(link)
+        return (link, url) if url else None
+
+    def download_listed_image(self, link, url, path):
+        """
+            Downloads an image and records it in the manifest. With an
+            image store, images it already holds are linked instead of
+            downloaded, and new images are moved into it
+
+            Args:
+                link(:class:`str`): URL of the image page
+                url(:class:`str`): URL of the image
+                path(:class:`str`): Path to store download at
+
+            Returns:
+                :class:`boolean` True if the image was saved by this call;
+                    false if it was already on disk or the thread has been
+                    asked to stop
+
+            Raises:
+                :class:`IOError`: The image returned a bad status
+        """
+        digest = None
+        store = self.image_store
+        filename = self.image_filename(url, path)
+        existed = os.path.exists(filename)
+        if store and not existed:
+            digest = store.lookup(url)
+            if digest:
+                self.logger.debug("Linking stored image %s", filename)
+                store.place(digest, filename)
+        if not digest:
+            filename = self.download_image(url, path)
+            if not filename:
+                return False
+            if store:
+                digest = store.add(url, filename)
+        self.image_manifest().add(link, url, filename, digest)
+        return not existed
+
+    def collect_image_links(self, tasks):
+        """
+            Waits for queued image link tasks to complete
+
+            Args:
+                tasks(:class:`list`): Tasks returned by
+                    :func:`submit_image_links`
+
+            Returns:
+                :class:`list` List of tuples of the link of each image
+                    page and the URL of its image, as from :func:`image_task`
 
-        if not err_queue.empty():
-            raise err_queue.get()
+            Raises:
+                :class:`IOError` Error returned on request
+        """
+        links = []
+        error = None
+        for task in tasks:
+            try:
+                link = task.result()
+            except IOError as e:
+                error = e
+                continue
+            if link:
+                links.append(link)
+
+        if error:
+            raise error
+
+        return links
+
+    def collect_downloads(self, tasks, page_num):
+        """
+            Waits for queued image downloads to complete, reporting
+            progress as each image is saved
 
-        return list(link_queue.queue)
+            Args:
+                tasks(:class:`list`): Tasks from :func:`download_listed_image`
+                page_num(:class:`int`): Page the images were found on
 
-    def download_images(self, link, path):
+            Raises:
+                :class:`IOError`: An image returned a bad status
+        """
+        error = None
+        for task in tasks:
+            try:
+                saved = task.result()
+            except IOError as e:
+                error = e
+                continue
+            if not saved:
+                continue
+            with self.images_lock:
+                self.images_downloaded += 1
+                downloaded = self.images_downloaded
+            self.write_update("Downloaded %d images (page %d)" %
+                              (downloaded, page_num))
+
+        if error:
+            raise error
+
+    def download_images(self, link, path, album_cb=None):
         """
             Downloads all images on pages with a base of a given link
 
@@ -554,68 +2629,127 @@ class UserArchiver(Archiver):
                     scraping images from
                 path(:class:`str`): Base path to store images at
 
+            Kwargs:
+                album_cb(:class:`function`): Function to call with the tag
+                    of each album linked from the pages; None to ignore
+                    albums
+
             Raises:
                 :class:`LimitReached`: Reached maximum specified images
                     to be downloaded
         """
         page_num = 1
-        self.check_path(path)
 
-        self.logger.debug("Downloading images at %s", self.img_url)
+        self.logger.debug("Downloading images at %s", link)
         base_url = link + "?page="
+        self.write_update("Analyzing image page %d" % page_num)
+        pending = self.submit_image_links(base_url + str(page_num), path,
+                                          album_cb)
         while True:
-            self.write_update("Analyzing image page %d" % page_num)
-            links = self.get_image_links(base_url + str(page_num))
+            links = self.collect_image_links(pending)
             if not links:
                 break
-
+            # Created once there is something to save, so albums started
+            # after the maximum is reached leave no empty folders
+            self.check_path(path)
+
+            downloads = [self.pool.submit(self.download_listed_image,
+                                          page_link, url, path)
+                         for page_link, url in links if url]
+
+            # Find the links on the next page while this one downloads
+            pending = []
+            if not self.stoprequest.isSet() and \
+                    (self.maximum is None or self.maximum > 0):
+                self.write_update("Analyzing image page %d" % (page_num + 1))
+                pending = self.submit_image_links(base_url +
+                                                  str(page_num + 1), path,
+                                                  album_cb)
+
+            self.collect_downloads(downloads, page_num)
             page_num += 1
-            for link in links:
-                self.download_image(link, path)
-                if self.stoprequest.isSet():
-                    break
 
-            if self.maximum is not None and self.maximum <= 0:
+            if not pending and self.maximum is not None and self.maximum <= 0:
                 raise LimitReached
             if self.stoprequest.isSet():
                 self.logger.debug("Halting due to join request")
                 break
 
-    def get_images(self):
+    def images_path(self):
         """
-            Download all images excluding albums
+            Gets the directory the user's images are stored under
+
+            Returns:
+                :class:`str` Path of the images directory
         """
         if self.path:
-            path = os.path.join(self.path, "images")
-        else:
-            path = os.path.join(self.username, "images")
+            return os.path.join(self.path, "images")
+        return os.path.join(self.username, "images")
+
+    def album_path(self, tag):
+        """
+            Gets the directory the images of an album are stored under
 
-        self.download_images(self.img_url, path)
+            Args:
+                tag(:class:`bs4.Tag`): Link to the album
 
-    def get_albums(self):
+            Returns:
+                :class:`str` Path of the album directory
         """
-            Download all images in albums
+        name_tag = tag.find("p", class_="name")
+        album_name = name_tag.decode_contents().encode('utf8', 'ignore')
+        album_name = ''.join(c for c in str(album_name) if c in valid_chars)
+        return os.path.join(self.images_path(), album_name)
+
+    def get_gallery(self):
         """
-        soup = self.get_page(self.img_url)
-        blks = soup.find_all("ul", class_='large-image-blocks')
-        if self.path:
-            base_path = os.path.join(self.path, "images")
-        else:
-            base_path = os.path.join(self.username, "images")
+            Download all images, in and out of albums, in one pass over
+            the gallery pages. Albums are crawled alongside each other
+            as they are found, sharing the workers and maximum of the
+            archive
 
-        for blk in blks:
-            for tag in blk.find_all("a"):
-                link = tag.attrs["href"]
-                if link.rfind("album") == -1:
-                    break
-                name_tag = tag.find("p", class_="name")
-                album_name = name_tag.decode_contents().encode('utf8', 'ignore')
-                album_name = ''.join(c for c in str(album_name)
-                                     if c in valid_chars)
-                path = os.path.join(base_path, album_name)
-                self.download_images(link, path)
-                if self.stoprequest.isSet():
-                    return
+            Raises:
+                :class:`LimitReached`: Reached maximum specified images
+                    to be downloaded
+                :class:`IOError`: A page or image returned a bad status
+        """
+        albums = collections.OrderedDict()
+        album_pool = WorkerPool(self.album_jobs)
+        # Created before any album starts, so album folders only ever
+        # need their last level made, and all albums share one manifest
+        self.check_path(self.images_path())
+        self.image_manifest()
+
+        def add_album(tag):
+            link = str(tag.attrs["href"])
+            spent = self.maximum is not None and self.maximum <= 0
+            if link not in albums and not spent and \
+                    not self.stoprequest.isSet():
+                albums[link] = album_pool.submit(self.download_images, link,
+                                                 self.album_path(tag))
+
+        limited = False
+        error = None
+        try:
+            self.download_images(self.img_url, self.images_path(), add_album)
+        except LimitReached:
+            limited = True
+        except IOError as e:
+            error = e
+        finally:
+            for task in albums.values():
+                try:
+                    task.result()
+                except LimitReached:
+                    limited = True
+                except IOError as e:
+                    error = e
+            album_pool.shutdown()
+
+        if error:
+            raise error
+        if limited:
+            raise LimitReached
 
 
 class GroupArchiver(UserArchiver):
@@ -635,13 +2769,17 @@ class GroupArchiver(UserArchiver):
             thread_cb(:class:`function`): Function to call when thread completes
             progress_label(:class:`tk.StringVar`): Location to write updates
                 to for the GUI
+
+        Kwargs:
+            Passed through to :class:`UserArchiver`
     """
 
     def __init__(self, maximum, size, path, verbose, username, thread_cb,
-                 progress_label):
+                 progress_label, **kwargs):
         super(GroupArchiver, self).__init__(maximum, size, path, verbose,
-                                           username, thread_cb, progress_label)
-        self.news_url = "https://roosterteeth.com/group/" + username
+                                           username, thread_cb, progress_label,
+                                           **kwargs)
+        self.news_url = self.site_url + "/group/" + username
         self.friends_url = None
         self.img_url = None
 
@@ -649,46 +2787,7 @@ class GroupArchiver(UserArchiver):
         """
             Finds and writes all news posts specified by the class
         """
-        journal_base_url = self.news_url + "?page="
-        hashes = set()
-        news_posts = []
-        num_journals = 0
-        page_num = 1
-        try:
-            while True:
-                self.write_update("Scraping journal page %d" % page_num)
-                activity = self.get_page(journal_base_url + str(page_num))
-                page_num += 1
-                elements = activity.findAll("div", class_="media-content")
-                if not elements:
-                    break
-                for element in elements:
-                    """ Only save news posts """
-                    post_tag = element.find("p", class_="post-tag-label")
-                    if not post_tag:
-                        continue
-                    body = element.find("div", class_="post-content")
-                    body = body.decode_contents()
-                    hashes.add(hash(body))
-                    """ Avoid duplicate news_posts """
-                    if len(hashes) == num_journals:
-                        self.logger.debug("Found duplicate hash")
-                        continue
-                    num_journals += 1
-                    news_posts.append(self.format_journal(element))
-                    if self.maximum is not None and \
-                            num_journals >= self.maximum:
-                        raise LimitReached
-
-                if self.stoprequest.isSet():
-                    self.logger.debug("Halting due to join request")
-                    break
-
-        except LimitReached:
-            pass
-
-        self.logger.debug("Preparing to write %d news posts", len(news_posts))
-        self.write_journals(news_posts)
+        self.archive_posts(False, "news posts")
 
     def run(self):
         self.get_news_posts()
@@ -701,9 +2800,7 @@ class ImageArchiver(UserArchiver):
 
     def run(self):
         try:
-            self.get_images()
-            if not self.stoprequest.isSet():
-                self.get_albums()
+            self.get_gallery()
         except LimitReached:
             pass
 
@@ -746,13 +2843,16 @@ class ForumArchiver(Archiver):
             thread_cb(:class:`function`): Function to call when thread completes
             progress_label(:class:`tk.StringVar`): Location to write updates
                 to for the GUI
+
+        Kwargs:
+            Passed through to :class:`Archiver`
     """
 
     def __init__(self, maximum, size, path, verbose, url, thread_cb,
-                 progress_label):
+                 progress_label, **kwargs):
         self.url = url
         super(ForumArchiver, self).__init__(maximum, size, path, verbose,
-                                            thread_cb, progress_label)
+                                            thread_cb, progress_label, **kwargs)
 
     def verify(self):
         """
@@ -765,7 +2865,7 @@ class ForumArchiver(Archiver):
                 :class:`IOError` An unknown network error occured
         """
         try:
-            r = requests.get(self.url, headers=HEADERS)
+            r = self.fetch(self.url)
         except (InvalidSchema, MissingSchema):
             self.logger.error("Malformed URL %s", self.url)
             return False
@@ -804,11 +2904,11 @@ class ForumArchiver(Archiver):
                 post(:class:`BeautifulSoup`): Post to get content from
 
             Returns:
-                :class:`str` Content of the post
+                :class:`unicode` Html content of the post
         """
         body = post.find("div", class_="post-body")
         self.format_replies(body)
-        return body.decode_contents().encode('utf8', 'ignore')
+        return body.decode_contents()
 
     def get_timestamp(self, post):
         """
@@ -913,56 +3013,134 @@ class ForumArchiver(Archiver):
                     formatted to be written to a file
         """
         posts = self.get_posts(soup)
-        out = ""
-        for post in posts:
-            out += self.format_post(post)
-        return out
+        return u"".join(self.format_post(post) for post in posts)
 
-    def format_post(self, post):
+    def write_fragment(self, fragment, writer, page_num):
         """
-            Formats a post for writting to a file. Extracts the poster,
-            number of mods, post number, timestamp, and post content and
-            arranges them for archive writing
+            Writes the posts of a page formatted by :func:`parse_page`
+            to the current output file
 
             Args:
-                post(:class:`BeautifulSoup`): Post to format
+                fragment(:class:`unicode`): Formatted posts of the page
+                writer(:class:`PostWriter`): Writer for the thread files
+                page_num(:class:`int`): Number of the page
+        """
+        writer.write(PAGE_MARKER.format(page=page_num))
+        writer.write(fragment)
+        writer.end_item()
 
-            Returns:
-                :class:`str` Formatted post
+    def parse_shards(self, urls):
         """
-        poster = self.get_poster(post)
-        mods = self.get_mods(post)
-        post_num = self.get_post_num(post)
-        timestamp = self.get_timestamp(post)
-        body = self.get_body(post)
-        post_soup = BeautifulSoup("", "html.parser")
+            Fetches and parses pages in a pool of worker processes so
+            parsing is spread across cores. Each task covers a run of
+            `SHARD_SIZE` pages, and the formatted pages are yielded in
+            order. The pool is terminated when the generator is closed.
+            The page cache is not used by the worker processes, and the
+            metrics they record are added to those of this archiver
+
+            Args:
+                urls(:class:`iterable`): URLs of the pages; must be finite
+
+            Returns:
+                :class:`generator` Formatted posts of each page
 
-        header_tag = post_soup.new_tag("h3")
-        # Have to create it this way beacuse of the name attribute
-        header_anchor = Tag(builder=post_soup.builder, name="a",
-                            attrs={'name': post_num[1:]})
+            Raises:
+                :class:`IOError`: A page returned a bad status
+        """
+        urls = list(urls)
+        shards = [urls[ii:ii + SHARD_SIZE]
+                  for ii in xrange(0, len(urls), SHARD_SIZE)]
+        options = {"parser": self.parser,
+                   "max_rate": self.limiter.max_rate / self.processes}
+        self.logger.debug("Parsing %d pages in %d processes", len(urls),
+                          self.processes)
+        pool = multiprocessing.Pool(self.processes, shard_init,
+                                    (self.__class__, self.url, options))
+        try:
+            for fragments, metrics in pool.imap(parse_shard, shards):
+                self.metrics.merge(metrics)
+                for fragment in fragments:
+                    yield fragment
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def write_page(self, soup, writer, page_num):
+        """
+            Finds all posts in a page and writes them to the current
+            output file as they are formatted
 
-        header_anchor.string = poster
-        header_tag.append(header_anchor)
-        post_soup.append(header_tag)
+            Args:
+                soup(:class:`BeautifulSoup`): Page to scrape
+                writer(:class:`PostWriter`): Writer for the thread files
+                page_num(:class:`int`): Number of the page
+        """
+        writer.write(PAGE_MARKER.format(page=page_num))
+        for post in self.get_posts(soup):
+            writer.write(self.format_post(post))
+        writer.end_item()
 
-        post_link_tag = post_soup.new_tag("a", href=post_num)
-        info_tag = post_soup.new_tag("p")
-        info_tag.append(post_link_tag)
-        info_tag.a.string = post_num
-        info_tag.append(" - %s" % timestamp)
-        post_soup.append(info_tag)
+    def format_post(self, post):
+        """
+            Formats a post for writting to a file. Extracts the poster,
+            number of mods, post number, timestamp, and post content and
+            arranges them for archive writing
 
-        post_soup.append(BeautifulSoup(body, "html.parser"))
+            Args:
+                post(:class:`BeautifulSoup`): Post to format
 
-        mod_tag = post_soup.new_tag("p")
-        mod_tag.append(post_soup.new_tag("em"))
-        mod_tag.em.string = "Mods: %d" % mods
-        post_soup.append(mod_tag)
+            Returns:
+                :class:`unicode` Formatted post
+        """
+        with self.metrics.timer("format"):
+            post_num = self.get_post_num(post)
+            return POST_TEMPLATE.format(
+                anchor=quoteattr(post_num[1:]),
+                poster=self.get_poster(post),
+                link=quoteattr(post_num),
+                post_num=post_num,
+                timestamp=escape(self.get_timestamp(post)),
+                body=self.get_body(post),
+                mods=self.get_mods(post))
+
+    def find_archived(self, num_pages):
+        """
+            Finds where an existing archive of the thread ends, using the
+            page markers written before each page. The last archived page
+            is fetched again, since it may have gained posts, and anything
+            after it is fetched for the first time
 
-        post_soup.append(post_soup.new_tag("hr"))
+            Args:
+                num_pages(:class:`int`): Page count of the thread
 
-        return post_soup.prettify()
+            Returns:
+                :class:`dict` Progress in the same form as a checkpoint;
+                    None if there is no usable archive
+        """
+        files = [int(name[:-len(".html")]) for name in os.listdir(self.path)
+                 if re.match(r"^\d+\.html$", name)]
+        if not files:
+            return None
+        file_num = max(files)
+        with open(os.path.join(self.path, str(file_num) + ".html"), "rb") as f:
+            content = f.read()
+        pages = [(int(match.group(1)), match.start())
+                 for match in PAGE_MARKER_RE.finditer(content)
+                 if int(match.group(1)) <= num_pages]
+        if not pages:
+            self.logger.debug("No page markers in %d.html", file_num)
+            return None
+
+        # Cut the file where the page being fetched again starts
+        last_page, offset = pages[-1]
+        items = len(pages) - 1
+        if not items:
+            # The page starts the file, so the whole file is written again
+            file_num -= 1
+        self.logger.debug("Archive ends on page %d", last_page)
+        return {"page": last_page - 1,
+                "writer": {"file_num": file_num, "items": items,
+                           "total": last_page - 1, "offset": offset}}
 
     def parse_thread(self):
         """
@@ -978,28 +3156,380 @@ class ForumArchiver(Archiver):
         num_pages = self.get_page_count(page)
         self.check_path(self.path)
 
-        out = ""
+        checkpoint = Checkpoint(self.path)
+        state = self.load_checkpoint(checkpoint, base_url)
+        # Last page already in the archive, which is kept even if it lies
+        # past the maximum
+        archived = state["page"] if state else 0
+        if not state and self.incremental:
+            state = self.find_archived(num_pages)
+            if state:
+                # The last archived page is fetched again
+                archived = state["page"] + 1
         if self.maximum is not None:
-            num_pages = min(self.maximum, num_pages)
-        for ii in range(1, num_pages+1):
-            url = base_url + "?page=" + str(ii)
-            self.write_update("Scraping page %d of %d" % (ii, num_pages))
-            page = self.get_page(url)
-            out += self.parse_page(page)
-            if self.size and ii % self.size == 0:
-                self.write_posts(out, str(ii/self.size), self.path)
-                out = ""
-            if self.stoprequest.isSet():
-                self.logger.debug("Halting due to join request")
-                break
-        if out:
-            self.write_posts(out, str(1 + (ii/self.size)), self.path)
-            self.write_update("Wrote %d pages to %d files" %
-                              (ii, (1+(ii/self.size))))
+            num_pages = min(max(self.maximum, archived), num_pages)
+        first = state["page"] + 1 if state else 1
+        ii = first - 1
+        urls = self.page_urls(base_url + "?page=", num_pages, first)
+        if self.processes > 1:
+            pages = self.parse_shards(urls)
+            write = self.write_fragment
         else:
-            self.write_update("Wrote %d pages to %d files" %
-                              (ii, (ii/self.size)))
+            pages = self.fetch_pages(urls)
+            write = self.write_page
+        with PostWriter(self.path, self.size, self.logger,
+                        metrics=self.metrics) as writer, closing(pages):
+            if state:
+                writer.resume(**state["writer"])
+            for ii, page in enumerate(pages, first):
+                self.write_update("Scraping page %d of %d" % (ii, num_pages))
+                write(page, writer, ii)
+                checkpoint.save(url=base_url, page=ii, writer=writer.state())
+                if self.stoprequest.isSet():
+                    self.logger.debug("Halting due to join request")
+                    break
+        if ii >= num_pages:
+            checkpoint.clear()
+        self.write_update("Wrote %d pages to %d files" %
+                          (ii, writer.file_num))
 
     def run(self):
         self.parse_thread()
         self.cleanup()
+
+
+# Archiver parsing pages in a worker process of :func:`parse_shards`
+shard_archiver = None
+
+
+def shard_init(archiver_class, url, options):
+    """
+        Creates the archiver used by a worker process
+
+        Args:
+            archiver_class(:class:`type`): Class of the coordinating archiver
+            url(:class:`str`): URL being archived
+            options(:class:`dict`): Keyword arguments for the archiver
+    """
+    global shard_archiver
+    logger = logging.getLogger()
+    if not logger.handlers:
+        # Started without the coordinator's log handlers; avoid replacing
+        # its log file
+        logger.addHandler(logging.NullHandler())
+    shard_archiver = archiver_class(None, 0, "", False, url, None, None,
+                                    workers=1, **options)
+
+
+def parse_shard(urls):
+    """
+        Fetches and formats a run of pages in a worker process
+
+        Args:
+            urls(:class:`list`): URLs of the pages
+
+        Returns:
+            :class:`tuple` List of the formatted posts of each page and the
+                metrics recorded while making it, from :func:`Metrics.to_dict`
+    """
+    shard_archiver.metrics = Metrics()
+    fragments = [shard_archiver.parse_page(shard_archiver.get_page(url))
+                 for url in urls]
+    return fragments, shard_archiver.metrics.to_dict()
+
+
+# Archiver used for each content type of a batch manifest
+BATCH_ARCHIVERS = {
+    "journals": JournalArchiver,
+    "images": ImageArchiver,
+    "friends": FriendsArchiver,
+    "news": GroupArchiver,
+    "forum": ForumArchiver
+}
+
+# Per-job options of a batch manifest, mapped to archiver arguments
+BATCH_OPTIONS = {
+    "max": ("maximum", int),
+    "size": ("size", int),
+    "path": ("path", str),
+    "prefetch": ("prefetch", int),
+    "resume": ("resume", bool),
+    "incremental": ("incremental", bool)
+}
+
+
+class BatchJob(object):
+    """
+        A single archive to make as part of a batch, along with the
+        result of making it
+
+        Args:
+            content(:class:`str`): Content type; a key of
+                :data:`BATCH_ARCHIVERS`
+            target(:class:`str`): Username, group name or forum URL
+            options(:class:`dict`): Archiver arguments overriding the
+                batch defaults
+    """
+
+    def __init__(self, content, target, options):
+        self.content = content
+        self.target = target
+        self.options = options
+        self.status = "pending"
+        self.error = None
+        self.elapsed = 0.0
+        self.requests = 0
+        self.bytes = 0
+
+    def __str__(self):
+        return "%s %s" % (self.content, self.target)
+
+    def throughput(self):
+        """
+            Gets the download rate of the job
+
+            Returns:
+                :class:`float` Bytes received per second
+        """
+        if not self.elapsed:
+            return 0.0
+        return self.bytes / self.elapsed
+
+
+def parse_option(token):
+    """
+        Parses a `name=value` option of a batch manifest. Boolean options
+        may be given by name alone
+
+        Args:
+            token(:class:`str`): Option to parse
+
+        Returns:
+            :class:`tuple` Archiver argument name and value
+
+        Raises:
+            :class:`ValueError`: The option is unknown or its value invalid
+    """
+    name, sep, value = token.partition("=")
+    if name not in BATCH_OPTIONS:
+        raise ValueError("Unknown option %s" % name)
+    arg, kind = BATCH_OPTIONS[name]
+    if kind is bool:
+        return arg, not sep or value.lower() in ("1", "true", "yes")
+    if not sep:
+        raise ValueError("Option %s needs a value" % name)
+    return arg, kind(value)
+
+
+def parse_manifest(filename):
+    """
+        Reads the jobs of a batch from a manifest. Each line holds a
+        content type, a target and any per-job options, separated by
+        whitespace. Blank lines and lines starting with # are ignored
+
+        Args:
+            filename(:class:`str`): Manifest to read
+
+        Returns:
+            :class:`list` List of :class:`BatchJob`
+
+        Raises:
+            :class:`ValueError`: A line of the manifest is invalid
+    """
+    jobs = []
+    with open(filename, "rb") as f:
+        for line_num, line in enumerate(f, 1):
+            tokens = line.split()
+            if not tokens or tokens[0].startswith("#"):
+                continue
+            content = tokens[0].lower()
+            if content not in BATCH_ARCHIVERS or len(tokens) < 2:
+                raise ValueError("Invalid job on line %d: %s" %
+                                 (line_num, line.strip()))
+            try:
+                options = dict(parse_option(token) for token in tokens[2:])
+            except ValueError as e:
+                raise ValueError("%s on line %d" % (e, line_num))
+            jobs.append(BatchJob(content, tokens[1], options))
+    return jobs
+
+
+class BatchRunner(object):
+    """
+        Runs many archive jobs at once in a single process. All jobs share
+        one connection pool, one pool of request workers and one page cache
+
+        Args:
+            jobs(:class:`list`): :class:`BatchJob` objects to run
+            maximum(:class:`int`): Default maximum number of elements to
+                scrape per job; None for no limit
+            size(:class:`int`): Default number of elements per file
+            path(:class:`str`): Default base directory for output
+            verbose(:class:`boolean`): Log debug to console
+
+        Kwargs:
+            concurrent_jobs(:class:`int`): Number of jobs run at the same time
+            workers(:class:`int`): Number of worker threads for parallel
+                requests, shared by all jobs
+            pool_size(:class:`int`): Number of hosts to keep pooled
+                connections for
+            host_connections(:class:`int`): Maximum number of simultaneous
+                connections to a single host
+            job_cb(:class:`function`): Function called with each
+                :class:`BatchJob` as it finishes
+            digests(:class:`DigestIndex`): Index shared by the journal and
+                news jobs
+            image_store(:class:`ImageStore`): Store shared by the image jobs
+            Others are passed through to every :class:`Archiver`
+
+        Raises:
+            :class:`ValueError`: Worker processes were requested. Forking
+                them while other jobs' threads hold locks can deadlock
+    """
+
+    def __init__(self, jobs, maximum, size, path, verbose,
+                 concurrent_jobs=DEFAULT_JOBS, workers=DEFAULT_WORKERS,
+                 pool_size=DEFAULT_POOL_SIZE,
+                 host_connections=DEFAULT_HOST_CONNECTIONS, job_cb=None,
+                 digests=None, image_store=None, **kwargs):
+        if kwargs.get("processes", 0) > 1:
+            raise ValueError("Worker processes cannot be used in a batch")
+        self.jobs = jobs
+        self.defaults = {"maximum": maximum, "size": size, "path": path}
+        self.verbose = verbose
+        self.concurrent_jobs = max(1, concurrent_jobs)
+        self.workers = workers
+        self.pool_size = pool_size
+        self.host_connections = host_connections
+        self.job_cb = job_cb
+        self.digests = digests
+        self.image_store = image_store
+        self.kwargs = kwargs
+        self.queue = Queue.Queue()
+        self.active = set()
+        self.lock = threading.Lock()
+        self.stoprequest = threading.Event()
+        self.session = None
+        self.pool = None
+        self.cache = None
+        self.metrics = Metrics()
+
+    def make_archiver(self, job):
+        """
+            Creates the archiver for a job
+
+            Args:
+                job(:class:`BatchJob`): Job to create the archiver for
+
+            Returns:
+                :class:`Archiver` Archiver sharing the batch session, pool
+                    and cache
+        """
+        archiver_class = BATCH_ARCHIVERS[job.content]
+        args = dict(self.defaults)
+        kwargs = dict(self.kwargs, session=self.session, pool=self.pool,
+                      cache=self.cache)
+        if issubclass(archiver_class, UserArchiver):
+            kwargs.update(digests=self.digests, image_store=self.image_store)
+        for name, value in job.options.items():
+            if name in args:
+                args[name] = value
+            else:
+                kwargs[name] = value
+        return archiver_class(args["maximum"], args["size"], args["path"],
+                              self.verbose, job.target, None, None, **kwargs)
+
+    def run_job(self, job):
+        """
+            Makes the archive of a job, recording its status and throughput
+
+            Args:
+                job(:class:`BatchJob`): Job to run
+        """
+        job.status = "running"
+        start = time.time()
+        archiver = None
+        try:
+            archiver = self.make_archiver(job)
+            with self.lock:
+                self.active.add(archiver)
+            if self.stoprequest.isSet():
+                archiver.stoprequest.set()
+            if not archiver.verify():
+                job.status = "not found"
+            else:
+                archiver.run()
+                job.status = "stopped" if archiver.stoprequest.isSet() \
+                    else "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = e
+            logging.getLogger().exception("Job %s failed", job)
+            if archiver:
+                archiver.cleanup()
+        finally:
+            job.elapsed = time.time() - start
+            if archiver:
+                with self.lock:
+                    self.active.discard(archiver)
+                job.requests = archiver.metrics.counters["requests"]
+                job.bytes = archiver.metrics.counters["bytes"]
+                self.metrics.merge(archiver.metrics)
+        if self.job_cb:
+            self.job_cb(job)
+
+    def worker(self):
+        """
+            Runs queued jobs until the queue is empty or the batch is
+            stopped
+        """
+        while not self.stoprequest.isSet():
+            try:
+                job = self.queue.get_nowait()
+            except Queue.Empty:
+                return
+            self.run_job(job)
+
+    def run(self):
+        """
+            Runs all jobs, returning once they are complete or the batch
+            has been stopped. An interrupt stops the batch
+
+            Returns:
+                :class:`list` Jobs of the batch
+        """
+        self.session = make_session(self.pool_size, self.host_connections)
+        self.pool = WorkerPool(self.workers)
+        if self.kwargs.get("cache_dir"):
+            self.cache = ResponseCache(
+                self.kwargs["cache_dir"],
+                self.kwargs.get("cache_size", DEFAULT_CACHE_SIZE),
+                logging.getLogger())
+        for job in self.jobs:
+            self.queue.put(job)
+        threads = [threading.Thread(target=self.worker)
+                   for _ in range(min(self.concurrent_jobs, len(self.jobs)))]
+        try:
+            for thread in threads:
+                thread.daemon = True
+                thread.start()
+            for thread in threads:
+                # Join with a timeout so the wait can be interrupted
+                while thread.is_alive():
+                    try:
+                        thread.join(0.5)
+                    except KeyboardInterrupt:
+                        self.stop()
+        finally:
+            self.pool.shutdown()
+            self.session.close()
+        return self.jobs
+
+    def stop(self):
+        """
+            Asks running jobs to halt and prevents queued jobs from starting
+        """
+        self.stoprequest.set()
+        with self.lock:
+            for archiver in self.active:
+                archiver.stoprequest.set()
@@ -0,0 +1,102 @@
+#! /usr/bin/python
+
+import sys
+import time
+import argparse
+
+from rtarchive import BatchRunner, DigestIndex, ImageStore, RateLimiter, \
+    parse_manifest, VERSION, DEFAULT_JOBS, DEFAULT_WORKERS, DEFAULT_PREFETCH, \
+    DEFAULT_MAX_RATE
+
+parser = argparse.ArgumentParser(
+    description='Scrape many RT users, groups and forums',
+    epilog="Each manifest line holds a content type (journals, images, "
+    "friends, news or forum), a username, group name or forum URL, and "
+    "optional per-job settings such as max=10 size=25 path=dir resume "
+    "incremental")
+
+parser.add_argument("manifest", type=str, help="File listing the jobs to run")
+parser.add_argument("-p", "--path", type=str, default='',
+                    help="Path to directory")
+parser.add_argument("-m", "--max", type=int, default=0,
+                    help="Max number of items per job; 0 for unlimited")
+parser.add_argument("-s", "--size", type=int, default=25,
+                    help="Max number of pages per file")
+parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_JOBS,
+                    help="Number of jobs to run at once")
+parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS,
+                    help="Number of parallel requests shared by all jobs")
+parser.add_argument("-f", "--prefetch", type=int, default=DEFAULT_PREFETCH,
+                    help="Number of pages to download ahead of parsing")
+parser.add_argument("--max-rate", type=float, default=DEFAULT_MAX_RATE,
+                    help="Highest number of requests per second for all jobs")
+parser.add_argument("--parser", type=str, default=None,
+                    help="HTML parser to use; lxml or html.parser")
+parser.add_argument("-c", "--cache-dir", type=str, default=None,
+                    help="Directory to cache downloaded pages in")
+parser.add_argument("-d", "--dedupe-index", type=str, default=None,
+                    help="File shared between archives to skip journals "
+                    "already archived for another user")
+parser.add_argument("--image-store", type=str, default=None,
+                    help="Directory shared between archives to keep each "
+                    "distinct image in once")
+parser.add_argument("--metrics", type=str, default=None,
+                    help="File to write the timings and counts of all jobs "
+                    "to; Prometheus text if it ends in .prom, JSON otherwise")
+parser.add_argument('-V', '--version', action='store_true',
+                    help="Print version and exit")
+parser.add_argument('-v', '--verbose', action='store_true',
+                    help="Print debug")
+
+
+def report(job):
+    """
+        Prints the result of a finished job
+
+        Args:
+            job(:class:`BatchJob`): Job that finished
+    """
+    print("%-9s %-40s %5d requests %8.1f KB %6.1fs %8.1f KB/s" %
+          (job.status, job, job.requests, job.bytes / 1024.0, job.elapsed,
+           job.throughput() / 1024.0))
+
+
+def main():
+    args = parser.parse_args()
+    if args.version:
+        print(VERSION)
+        return 0
+
+    try:
+        jobs = parse_manifest(args.manifest)
+    except (IOError, ValueError) as e:
+        print(e)
+        return -1
+    digests = None
+    if args.dedupe_index:
+        digests = DigestIndex(args.dedupe_index)
+    image_store = None
+    if args.image_store:
+        image_store = ImageStore(args.image_store)
+    runner = BatchRunner(jobs, args.max, args.size, args.path, args.verbose,
+                         concurrent_jobs=args.jobs, workers=args.workers,
+                         host_connections=args.workers, job_cb=report,
+                         digests=digests, image_store=image_store,
+                         prefetch=args.prefetch,
+                         parser=args.parser, cache_dir=args.cache_dir,
+                         rate_limiter=RateLimiter(max_rate=args.max_rate))
+    start = time.time()
+    runner.run()
+    elapsed = time.time() - start
+    if args.metrics:
+        runner.metrics.dump(args.metrics)
+
+    done = [job for job in jobs if job.status == "done"]
+    print("%d of %d jobs complete, %d requests, %.1f KB in %.1fs" %
+          (len(done), len(jobs), sum(job.requests for job in jobs),
+           sum(job.bytes for job in jobs) / 1024.0, elapsed))
+    return 0 if len(done) == len(jobs) else -1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
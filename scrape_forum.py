@@ -3,7 +3,8 @@
 import sys
 import argparse
 
-from rtarchive import ForumArchiver, VERSION
+from rtarchive import ForumArchiver, VERSION, DEFAULT_PREFETCH, \
+    DEFAULT_WORKERS, DEFAULT_MAX_RATE
 
 parser = argparse.ArgumentParser(description='Scrape an RT forum')
 
@@ -14,6 +15,29 @@ parser.add_argument("-m", "--max", type=int, default=0,
                     help="Max number of pages to parse; 0 for unlimited")
 parser.add_argument("-s", "--size", type=int, default=25,
                     help="Max number of pages per file")
+parser.add_argument("-f", "--prefetch", type=int, default=DEFAULT_PREFETCH,
+                    help="Number of pages to download ahead of parsing")
+parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS,
+                    help="Number of parallel page requests")
+parser.add_argument("-P", "--processes", type=int, default=0,
+                    help="Number of processes to parse pages in; 0 to parse "
+                    "in this process")
+parser.add_argument("--max-rate", type=float, default=DEFAULT_MAX_RATE,
+                    help="Highest number of requests per second")
+parser.add_argument("--parser", type=str, default=None,
+                    help="HTML parser to use; lxml or html.parser")
+parser.add_argument("-r", "--resume", action='store_true',
+                    help="Continue an interrupted run")
+parser.add_argument("-c", "--cache-dir", type=str, default=None,
+                    help="Directory to cache downloaded pages in")
+parser.add_argument("-i", "--incremental", action='store_true',
+                    help="Only fetch pages after the existing archive")
+parser.add_argument("--metrics", type=str, default=None,
+                    help="File to write timings and counts to; Prometheus "
+                    "text if it ends in .prom, JSON otherwise")
+parser.add_argument("--profile", action='store_true',
+                    help="Profile the run, writing archive.pstats and "
+                    "archive.folded next to archive.log")
 parser.add_argument('-V', '--version', action='store_true',
                     help="Print version and exit")
 parser.add_argument('-v', '--verbose', action='store_true', help="Print debug")
@@ -22,7 +46,12 @@ parser.add_argument('-v', '--verbose', action='store_true', help="Print debug")
 def main():
     args = parser.parse_args()
     forum = ForumArchiver(args.max, args.size, args.path, args.verbose,
-                          args.url)
+                          args.url, None, None, prefetch=args.prefetch,
+                          workers=args.workers, parser=args.parser,
+                          resume=args.resume, cache_dir=args.cache_dir,
+                          incremental=args.incremental,
+                          processes=args.processes,
+                          max_rate=args.max_rate, metrics_file=args.metrics)
 
     if args.version:
         print(forum.get_version())
@@ -32,7 +61,13 @@ def main():
     forum.logger.debug("Path: %s", args.path)
     forum.logger.debug("Max pages: %d", args.max)
     forum.logger.debug("Pages per file: %d", args.size)
-    return forum.parse_thread()
+    forum.logger.debug("Prefetch: %d", args.prefetch)
+    try:
+        if args.profile:
+            return forum.profiled(forum.parse_thread)
+        return forum.parse_thread()
+    finally:
+        forum.cleanup()
 
 if __name__ == "__main__":
     sys.exit(main())
@@ -3,7 +3,9 @@
 import sys
 import argparse
 
-from rtarchive import LimitReached, UserArchiver, VERSION
+from rtarchive import LimitReached, UserArchiver, VERSION, DEFAULT_WORKERS, \
+    DEFAULT_PREFETCH, DEFAULT_MAX_RATE, DEFAULT_CHUNK_SIZE, \
+    DEFAULT_ALBUM_JOBS, DigestIndex, ImageStore
 
 
 BASE_URL = "https://roosterteeth.com/user/"
@@ -18,16 +20,89 @@ parser.add_argument("-m", "--max", type=int, default=0,
                     help="Max number of items to parse; 0 for unlimited")
 parser.add_argument("-s", "--size", type=int, default=25,
                     help="Max number of journal pages per file")
+parser.add_argument("-f", "--prefetch", type=int, default=DEFAULT_PREFETCH,
+                    help="Number of pages to download ahead of parsing")
+parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS,
+                    help="Number of parallel requests")
+parser.add_argument("-a", "--album-jobs", type=int,
+                    default=DEFAULT_ALBUM_JOBS,
+                    help="Number of image albums to crawl at once")
+parser.add_argument("--max-rate", type=float, default=DEFAULT_MAX_RATE,
+                    help="Highest number of requests per second")
+parser.add_argument("--chunk-size", type=int,
+                    default=DEFAULT_CHUNK_SIZE // 1024,
+                    help="KB to read from the network at a time when "
+                    "downloading images")
+parser.add_argument("--parser", type=str, default=None,
+                    help="HTML parser to use; lxml or html.parser")
+parser.add_argument("-r", "--resume", action='store_true',
+                    help="Continue an interrupted journal run")
+parser.add_argument("-c", "--cache-dir", type=str, default=None,
+                    help="Directory to cache downloaded pages in")
+parser.add_argument("-i", "--incremental", action='store_true',
+                    help="Only add journals newer than the existing archive")
+parser.add_argument("-d", "--dedupe-index", type=str, default=None,
+                    help="File shared between archives to skip journals "
+                    "already archived for another user")
+parser.add_argument("--image-store", type=str, default=None,
+                    help="Directory shared between archives to keep each "
+                    "distinct image in once")
+parser.add_argument("--metrics", type=str, default=None,
+                    help="File to write timings and counts to; Prometheus "
+                    "text if it ends in .prom, JSON otherwise")
+parser.add_argument("--profile", action='store_true',
+                    help="Profile the run, writing archive.pstats and "
+                    "archive.folded next to archive.log")
 parser.add_argument('-V', '--version', action='store_true',
                     help="Print version and exit")
 parser.add_argument('-v', '--verbose', action='store_true',
                     help="Print debug")
 
 
+def scrape(user, content):
+    """
+        Scrapes one type of content of a user
+
+        Args:
+            user(:class:`UserArchiver`): Archiver of the user
+            content(:class:`str`): Images or Journals
+
+        Returns:
+            :class:`int` Exit status
+    """
+    try:
+        if content.lower() == "journals":
+            user.get_journals()
+        elif content.lower() == "images":
+            try:
+                user.get_gallery()
+            except LimitReached:
+                pass
+        else:
+            user.logger.error("Invalid content type %s", content)
+            parser.print_usage()
+            return -1
+    except IOError:
+        return -1
+    return 0
+
+
 def main():
     args = parser.parse_args()
+    digests = None
+    if args.dedupe_index:
+        digests = DigestIndex(args.dedupe_index)
+    image_store = None
+    if args.image_store:
+        image_store = ImageStore(args.image_store)
     user = UserArchiver(args.max, args.size, args.path, args.verbose,
-                        args.username)
+                        args.username, None, None, workers=args.workers,
+                        prefetch=args.prefetch, parser=args.parser,
+                        resume=args.resume, cache_dir=args.cache_dir,
+                        incremental=args.incremental, digests=digests,
+                        image_store=image_store, album_jobs=args.album_jobs,
+                        max_rate=args.max_rate, metrics_file=args.metrics,
+                        chunk_size=args.chunk_size * 1024)
 
     if args.version:
         print(user.get_version())
@@ -38,22 +113,13 @@ def main():
     user.logger.debug("Max items: %d", args.max)
     user.logger.debug("Items per file: %d", args.size)
     user.logger.debug("Content type: %s", args.content)
+    user.logger.debug("Workers: %d", args.workers)
     try:
-        if args.content.lower() == "journals":
-            user.get_journals()
-        elif args.content.lower() == "images":
-            try:
-                user.get_images()
-                user.get_albums()
-            except LimitReached:
-                pass
-        else:
-            user.logger.error("Invalid content type %s", args.content)
-            parser.print_usage()
-            return -1
-    except IOError:
-        return -1
-    return 0
+        if args.profile:
+            return user.profiled(scrape, user, args.content)
+        return scrape(user, args.content)
+    finally:
+        user.cleanup()
 
 
 if __name__ == "__main__":